@@ -1,12 +1,18 @@
 """pyJazz: A Python interpretation of the Jasmine testing framework."""
 
-import optparse
 import collections
+import cStringIO
+import gc
+import heapq
+import imp
 import itertools
-import mock
+import linecache
 import re
+import repr as reprlib
+import signal
 import sys
 import time
+import timeit
 import traceback
 import types
 from os import path
@@ -16,59 +22,240 @@ class UnassertedExpectation(Exception):
   """When a spec finishes but one or more expectations were not asserted."""
 
 
-def _ParseOptions():
+class SpecTimeout(BaseException):
+  """When a spec runs for longer than its timeout.
+
+  It is not an Exception, so that a spec catching every Exception cannot
+  swallow it and keep running.
+  """
+
+
+class _CoroutineTimeout(Exception):
+  """When a coroutine of a spec runs for longer than its timeout.
+
+  The event loop only passes Exceptions on to the coroutines waiting, so this
+  stands for a SpecTimeout until it gets out of the event loop.
+  """
+
+
+class BenchmarkRegression(Exception):
+  """When a benchmark spec got slower than its baseline allows."""
+
+
+OUTPUT_BASENAME_ONLY = True
+OUTPUT_STACKTRACE = True
+VERBOSITY = 3
+RUNS = 1
+JOBS = 1
+JSON_REPORT = None
+JUNIT_REPORT = None
+SLOWEST = 0
+MEMORY = 0
+BUDGET = None
+TIMEOUT = None
+MAX_FAILURES = 0
+MAX_REPR_SIZE = 500
+FILTER = None
+TAGS = []
+EXCLUDED_TAGS = []
+IMPACT_INDEX = '.jazz_impact.json'
+RECORD_IMPACT = False
+IMPACTED = False
+CACHE_FILE = '.jazz_cache.json'
+FAILED_FIRST = False
+LAST_FAILED = False
+BASELINE = '.jazz_baseline.json'
+SAVE_BASELINE = False
+REGRESSION = 10.0
+
+
+def _ParseOptions(args=None):
+  """Parses the command line options.
+
+  Options not given on the command line keep the current value of their
+  module setting, so settings made in code are not overridden.
+
+  Args:
+    args: A list of arguments to parse instead of sys.argv[1:].
+  Returns:
+    The options, as parsed by optparse.
+  """
+  import optparse  # Only needed by run(), not by matchers.
   parser = optparse.OptionParser()
   parser.add_option('-r', '--runs', help='Repeat the tests RUNS times.',
-                    type='int', default=1, dest='runs')
+                    type='int', default=RUNS, dest='runs')
   parser.add_option('-v', '--verbosity', help='Set the verbosity level.',
-                    default=3, dest='verbosity')
+                    type='int', default=VERBOSITY, dest='verbosity')
   parser.add_option('-q', '--quiet', help='No output. Return value only.',
                     action='store_const', const=0, dest='verbosity')
   parser.add_option('--noisy', help='As much output as possible.',
                     action='store_const', const=9, dest='verbosity')
   parser.add_option('--hide-stack', help='Hide stack traces.',
-                    action='store_false', dest='show_stack', default=True)
+                    action='store_false', dest='show_stack',
+                    default=OUTPUT_STACKTRACE)
   parser.add_option('--full-paths', help='Show full stack trace file paths.',
-                    action='store_false', dest='show_basename', default=True)
-  options, _ = parser.parse_args()
+                    action='store_false', dest='show_basename',
+                    default=OUTPUT_BASENAME_ONLY)
+  parser.add_option('--json-report', help='Write results as JSON Lines to '
+                    'FILE.', metavar='FILE', default=JSON_REPORT,
+                    dest='json_report')
+  parser.add_option('--junit-report', help='Write results as JUnit XML to '
+                    'FILE.', metavar='FILE', default=JUNIT_REPORT,
+                    dest='junit_report')
+  parser.add_option('--slowest', help='List the N slowest specs.', type='int',
+                    metavar='N', default=SLOWEST, dest='slowest')
+  parser.add_option('--memory', help='List the N specs that retained the most '
+                    'objects, and the suites that leak objects across runs.',
+                    type='int', metavar='N', default=MEMORY, dest='memory')
+  parser.add_option('--budget', help='Flag specs taking more than SECONDS.',
+                    type='float', metavar='SECONDS', default=BUDGET,
+                    dest='budget')
+  parser.add_option('--timeout', help='Fail specs still running after '
+                    'SECONDS, unless they have a timeout of their own.',
+                    type='float', metavar='SECONDS', default=TIMEOUT,
+                    dest='timeout')
+  parser.add_option('--max-failures', help='Stop once N specs failed.',
+                    type='int', metavar='N', default=MAX_FAILURES,
+                    dest='max_failures')
+  parser.add_option('--fail-fast', help='Stop at the first failing spec.',
+                    action='store_const', const=1, dest='max_failures')
+  parser.add_option('--max-repr-size', help='Shorten values in failure '
+                    'messages to N characters. 0 shows them in full.',
+                    type='int', metavar='N', default=MAX_REPR_SIZE,
+                    dest='max_repr_size')
+  parser.add_option('-f', '--filter', help='Only run specs whose full name '
+                    'matches REGEX.', metavar='REGEX', default=FILTER,
+                    dest='filter')
+  parser.add_option('-t', '--tag', help='Only run specs tagged TAG. May be '
+                    'repeated.', action='append', metavar='TAG',
+                    dest='tags')
+  parser.add_option('--exclude-tag', help='Do not run specs tagged TAG. May '
+                    'be repeated.', action='append', metavar='TAG',
+                    dest='excluded_tags')
+  parser.add_option('--record-impact', help='Record the source files each '
+                    'spec runs in the impact index.', action='store_true',
+                    default=RECORD_IMPACT, dest='record_impact')
+  parser.add_option('--impacted', help='Only run the specs that ran source '
+                    'files changed since they were recorded.',
+                    action='store_true', default=IMPACTED, dest='impacted')
+  parser.add_option('--impact-index', help='Keep the impact index in FILE.',
+                    metavar='FILE', default=IMPACT_INDEX, dest='impact_index')
+  parser.add_option('--failed-first', help='Run the specs that failed last '
+                    'time first.', action='store_true', default=FAILED_FIRST,
+                    dest='failed_first')
+  parser.add_option('--last-failed', help='Only run the specs that failed '
+                    'last time.', action='store_true', default=LAST_FAILED,
+                    dest='last_failed')
+  parser.add_option('--cache-file', help='Keep the outcomes of specs in FILE.',
+                    metavar='FILE', default=CACHE_FILE, dest='cache_file')
+  parser.add_option('--no-cache', help='Do not keep the outcomes of specs.',
+                    action='store_const', const=None, dest='cache_file')
+  parser.add_option('--baseline', help='Compare benchmark specs to the '
+                    'results kept in FILE.', metavar='FILE', default=BASELINE,
+                    dest='baseline')
+  parser.add_option('--save-baseline', help='Keep the results of benchmark '
+                    'specs in the baseline file.', action='store_true',
+                    default=SAVE_BASELINE, dest='save_baseline')
+  parser.add_option('--regression', help='Fail benchmark specs more than '
+                    'PERCENT slower than their baseline.', type='float',
+                    metavar='PERCENT', default=REGRESSION, dest='regression')
+  parser.add_option('-j', '--jobs', help='Run top level suites in JOBS '
+                    'worker processes.', type='int', default=JOBS, dest='jobs')
+  options, _ = parser.parse_args(args)
   return options
 
-OPTIONS = _ParseOptions()
 
-OUTPUT_BASENAME_ONLY = OPTIONS.show_basename
-OUTPUT_STACKTRACE = OPTIONS.show_stack
-VERBOSITY = OPTIONS.verbosity
-RUNS = OPTIONS.runs
+def _configure(args=None):
+  """Updates the module settings from the command line options.
+
+  Args:
+    args: A list of arguments to parse instead of sys.argv[1:].
+  """
+  global OUTPUT_BASENAME_ONLY, OUTPUT_STACKTRACE, VERBOSITY, RUNS, JOBS
+  global JSON_REPORT, JUNIT_REPORT, SLOWEST, MEMORY, BUDGET, TIMEOUT
+  global MAX_FAILURES
+  global MAX_REPR_SIZE, FILTER, TAGS, EXCLUDED_TAGS
+  global IMPACT_INDEX, RECORD_IMPACT, IMPACTED
+  global CACHE_FILE, FAILED_FIRST, LAST_FAILED
+  global BASELINE, SAVE_BASELINE, REGRESSION
+  options = _ParseOptions(args)
+  OUTPUT_BASENAME_ONLY = options.show_basename
+  OUTPUT_STACKTRACE = options.show_stack
+  VERBOSITY = options.verbosity
+  RUNS = options.runs
+  JOBS = options.jobs
+  JSON_REPORT = options.json_report
+  JUNIT_REPORT = options.junit_report
+  SLOWEST = options.slowest
+  MEMORY = options.memory
+  BUDGET = options.budget
+  TIMEOUT = options.timeout
+  MAX_FAILURES = options.max_failures
+  MAX_REPR_SIZE = options.max_repr_size
+  FILTER = options.filter
+  # Tags given replace the previous ones, rather than adding up.
+  if options.tags is not None:
+    TAGS = options.tags
+  if options.excluded_tags is not None:
+    EXCLUDED_TAGS = options.excluded_tags
+  IMPACT_INDEX = options.impact_index
+  RECORD_IMPACT = options.record_impact
+  IMPACTED = options.impacted
+  CACHE_FILE = options.cache_file
+  FAILED_FIRST = options.failed_first
+  LAST_FAILED = options.last_failed
+  BASELINE = options.baseline
+  SAVE_BASELINE = options.save_baseline
+  REGRESSION = options.regression
 
 _SUITES = []
+_REPORTERS = []
 _SOLO_MODE = False
 _DECORATOR_MODE = False
 
 
-def run():
+def run(args=None):
   """Invokes the Jazz Suite Runner.
 
   This runs your tests.
+
+  Args:
+    args: A list of command line arguments to use instead of sys.argv[1:].
   """
-  suite_runner = _SuiteRunner(_SUITES)
+  _configure(args)
+  file_reporters = []
+  if JSON_REPORT:
+    file_reporters.append(JsonLinesReporter(JSON_REPORT))
+  if JUNIT_REPORT:
+    file_reporters.append(JUnitXmlReporter(JUNIT_REPORT))
+  suite_runner = _SuiteRunner(_SUITES, reporters=_REPORTERS + file_reporters)
   total_failures = 0
   total_spec_count = 0
   total_elapsed = 0
   runs_failing = 0
-  for _ in xrange(RUNS):
-    failures, spec_count, elapsed = suite_runner.run()
+  runs = 0
+  while runs < RUNS and not (MAX_FAILURES and total_failures >= MAX_FAILURES):
+    max_failures = MAX_FAILURES - total_failures if MAX_FAILURES else 0
+    failures, spec_count, elapsed = suite_runner.run(max_failures)
+    runs += 1
     runs_failing += 1 if failures else 0
     total_failures += failures
     total_spec_count += spec_count
     total_elapsed += elapsed
+  if MEMORY and VERBOSITY > 0:
+    suite_runner._print_leaks()
   if RUNS > 1:
+    if runs < RUNS:
+      print '==== STOPPED ==== after %d/%d runs.' % (runs, RUNS)
     if runs_failing:
       print '==== %d/%d RUNS FAILED ==== %d/%d total test failures.' % (
-          runs_failing, RUNS, total_failures, total_spec_count)
+          runs_failing, runs, total_failures, total_spec_count)
     else:
       print '==== ALL %d RUNS PASSED ==== %s tests passed in %.3fs' % (
           RUNS, total_spec_count, total_elapsed)
-    
+  for reporter in file_reporters:
+    reporter.close()
+
   if total_failures:
     sys.exit(total_failures)
 
@@ -132,6 +319,8 @@ class Describe(object):
   suite = True
   solo = False
   excluded = False
+  tags = ()
+  timeout = None
 
 class DDescribe(Describe):
   """The base class for a solo Jazz suite.
@@ -152,42 +341,125 @@ class XDescribe(Describe):
 xDescribe = XDescribe
 
 
-def it(fn):
+def it(fn=None, tags=(), independent=False, timeout=None):
   """A decorator for creating a regular Jazz spec.
 
+  It can also be given tags to select the spec by: @it(tags=['slow']).
+
   Args:
     fn: A function to setup as a spec.
+    tags: A list of tags for the spec.
+    independent: Whether the spec may run concurrently with the independent
+      specs next to it in its suite, if they are coroutines.
+    timeout: The seconds after which the spec fails if it is still running,
+      or 0 for none. It overrides the timeout of the suites.
   """
+  if fn is None:
+    return lambda fn: it(fn, tags=tags, independent=independent,
+                         timeout=timeout)
   fn.spec = True
   fn.solo = False
+  fn.tags = tags
+  fn.independent = independent
+  fn.timeout = timeout
   _enable_decorator_mode()
   return fn
 
-def iit(fn):
+def iit(fn=None, tags=(), independent=False, timeout=None):
   """A decorator for creating a solo Jazz spec.
 
   Solo specs will always be run, however specs outside of a solo spec will not.
 
   Args:
     fn: A function to setup as a solo spec.
+    tags: A list of tags for the spec.
+    independent: Whether the spec may run concurrently with the independent
+      specs next to it in its suite, if they are coroutines.
+    timeout: The seconds after which the spec fails if it is still running,
+      or 0 for none. It overrides the timeout of the suites.
   """
+  if fn is None:
+    return lambda fn: iit(fn, tags=tags, independent=independent,
+                          timeout=timeout)
   fn.spec = True
   fn.solo = True
+  fn.tags = tags
+  fn.independent = independent
+  fn.timeout = timeout
   _enable_solo_mode()
   _enable_decorator_mode()
   return fn
 
-def xit(fn):
+def benchmark(fn=None, tags=(), warmup=1, repeat=5, number=None,
+              timeout=None):
+  """A decorator for creating a benchmark Jazz spec.
+
+  The spec runs warmup times, then is timed repeat times. The min, median and
+  standard deviation of its run time are reported, and it fails if its min got
+  more than REGRESSION percent slower than in the BASELINE file.
+
+  Args:
+    fn: A function to setup as a benchmark spec. It cannot be a coroutine.
+    tags: A list of tags for the spec.
+    warmup: How many times to run the spec before timing it.
+    repeat: How many times to time the spec.
+    number: How many runs of the spec to time together, or None for enough
+      runs to take at least _BENCHMARK_MIN_TIME.
+    timeout: The seconds after which the spec fails if it is still running,
+      or 0 for none. It overrides the timeout of the suites.
+  """
+  if fn is None:
+    return lambda fn: benchmark(fn, tags=tags, warmup=warmup, repeat=repeat,
+                                number=number, timeout=timeout)
+  fn = it(fn, tags=tags, timeout=timeout)
+  fn.benchmark = {'warmup': warmup, 'repeat': repeat, 'number': number}
+  return fn
+bench = benchmark
+
+def xit(fn=None, tags=(), independent=False, timeout=None):
   """A decorator for creating an excluded Jazz spec.
 
-  Excluded specs will not run.
+  Excluded specs will not run. It takes the arguments of it, so that any spec
+  can be excluded by renaming its decorator, but ignores them.
 
   Args:
     fn: A function to setup as an excluded spec.
+    tags: Ignored.
+    independent: Ignored.
+    timeout: Ignored.
   """
+  if fn is None:
+    return xit
   _enable_decorator_mode()
   return fn
 
+def let(fn):
+  """A decorator for creating a lazy suite fixture.
+
+  The fixture is built by fn the first time it is read in a suite instance,
+  then kept for the specs that follow in the suite. It is never built if no
+  spec reads it.
+
+  Args:
+    fn: A method of the suite that returns the fixture.
+  """
+  return _Fixture(fn)
+
+class _Fixture(object):
+  """A lazy suite fixture, built by a method of the suite when first read."""
+
+  def __init__(self, fn):
+    self.fn = fn
+    self.__name__ = fn.__name__
+    self.__doc__ = fn.__doc__
+
+  def __get__(self, instance, owner):
+    """Builds the fixture and keeps it in the instance, to be read next."""
+    if instance is None:
+      return self
+    fixture = instance.__dict__[self.__name__] = self.fn(instance)
+    return fixture
+
 def add_matchers(matchers):
   """Adds one or more matchers to the global set of matchers.
 
@@ -212,9 +484,20 @@ def add_matchers(matchers):
     add_matchers([matchers])
   else:
     raise ValueError('Argument was was not a list, dict, or callable.')
+  _clear_resolved_matchers()
 addMatcher = addMatchers = add_matcher = add_matchers
 
 
+def add_reporter(reporter):
+  """Adds a reporter to be notified of results by every following run().
+
+  Args:
+    reporter: A Reporter instance.
+  """
+  _REPORTERS.append(reporter)
+addReporter = add_reporter
+
+
 def expect(actual):
   """Creates an expectation object for testing an actual value.
 
@@ -226,25 +509,205 @@ def expect(actual):
   return _Expectation(actual)
 
 
-class _JazzMock(mock.Mock):
+def _hashes_by_value(cls):
+  """Checks that instances of a class hash consistently with their equality.
 
-  def _get_child_mock(self, name=None, **kwargs):
-    if name and name != '__name__':
-      return _JazzMock()
-    return None
+  A class that overrides __eq__ or __cmp__ but not __hash__ keeps the
+  identity hash, so equal instances need not hash the same.
+  """
+  for base in cls.__mro__:
+    if '__hash__' in vars(base):
+      return True
+    if '__eq__' in vars(base) or '__cmp__' in vars(base):
+      return False
+  return True
+
+
+def _check_indexable(values):
+  for value in values:
+    if not _hashes_by_value(type(value)):
+      raise TypeError('%s is hashed by identity' % type(value).__name__)
+    if isinstance(value, (tuple, frozenset)):
+      _check_indexable(value)
+
+
+def _call_key(args, kwargs):
+  """Gets a hashable key for a call's arguments.
+
+  Raises:
+    TypeError: If any of the arguments is unhashable, or hashed by identity
+        though it is compared by value.
+  """
+  key = (args, frozenset(kwargs.iteritems()))
+  hash(key)
+  _check_indexable(args)
+  _check_indexable(kwargs.itervalues())
+  return key
+
+
+class _Spy(object):
+  """A callable that records the arguments of every call to it.
+
+  Like a mock, it returns its return_value, unless it has a side_effect: an
+  exception to raise, a callable to call with the same arguments, or an
+  iterable of the values to return in turn. It has no other attributes, so it
+  cannot be chained. Once it is asked whether it was called with some
+  arguments, it also keeps an index of its calls with hashable arguments.
+  """
+  __slots__ = ('__name__', 'calls', 'return_value', 'side_effect', '_index',
+               '_unindexed')
+
+  def __init__(self, name):
+    self.__name__ = name
+    self.calls = []
+    self.return_value = None
+    self.side_effect = None
+    self._index = None
+    self._unindexed = 0
+
+  def __call__(self, *args, **kwargs):
+    self.calls.append((args, kwargs))
+    if self._index is not None:
+      self._add_to_index(args, kwargs)
+    if self.side_effect is None:
+      return self.return_value
+    return self._call_side_effect(args, kwargs)
+
+  def _call_side_effect(self, args, kwargs):
+    effect = self.side_effect
+    if _is_exception(effect):
+      raise effect
+    if callable(effect):
+      return effect(*args, **kwargs)
+    if not isinstance(effect, collections.Iterator):
+      effect = self.side_effect = iter(effect)
+    result = next(effect)
+    if _is_exception(result):
+      raise result
+    return result
+
+  def _add_to_index(self, args, kwargs):
+    try:
+      self._index.add(_call_key(args, kwargs))
+    except TypeError:
+      self._unindexed += 1
+
+  def called_with(self, args, kwargs):
+    """Checks if the spy was ever called with some arguments.
+
+    Args:
+      args: The positional arguments of the call.
+      kwargs: The keyword arguments of the call.
+    Returns:
+      True if it was; False otherwise.
+    """
+    if self._index is None:
+      self._index = set()
+      for call_args, call_kwargs in self.calls:
+        self._add_to_index(call_args, call_kwargs)
+    try:
+      if _call_key(args, kwargs) in self._index:
+        return True
+    except TypeError:
+      pass
+    else:
+      if not self._unindexed:
+        return False
+    return (args, kwargs) in self.calls
+
+  @property
+  def call_count(self):
+    return len(self.calls)
+
+  @property
+  def called(self):
+    return bool(self.calls)
+
+  @property
+  def call_args(self):
+    return self.calls[-1] if self.calls else None
+
+  @property
+  def call_args_list(self):
+    return self.calls
 
+  def assert_called_with(self, *args, **kwargs):
+    expected = _format_call(self.__name__, args, kwargs)
+    if not self.calls:
+      raise AssertionError('Expected call: %s\nNot called' % expected)
+    if self.calls[-1] != (args, kwargs):
+      raise AssertionError('Expected call: %s\nActual call: %s' % (
+          expected, _format_call(self.__name__, *self.calls[-1])))
 
-def __callable(*args, **kwargs): pass
+  def assert_called_once_with(self, *args, **kwargs):
+    if len(self.calls) != 1:
+      raise AssertionError('Expected to be called once. Called %d times.' %
+                           len(self.calls))
+    self.assert_called_with(*args, **kwargs)
+
+  def assert_any_call(self, *args, **kwargs):
+    if not self.called_with(args, kwargs):
+      raise AssertionError('%s call not found' %
+                           _format_call(self.__name__, args, kwargs))
+
+  def reset_mock(self):
+    self.calls = []
+    self._index = None
+    self._unindexed = 0
+
+  def __repr__(self):
+    return '<spy %s>' % self.__name__
+
+
+def _is_exception(value):
+  return (isinstance(value, BaseException) or
+          isinstance(value, type) and issubclass(value, BaseException))
+
+
+def _format_call(name, args, kwargs):
+  arguments = [repr(arg) for arg in args]
+  arguments.extend('%s=%r' % item for item in sorted(kwargs.iteritems()))
+  return '%s(%s)' % (name, ', '.join(arguments))
+
+
+class _SpyObj(object):
+  """The base class for spy objects, whose attributes are spies."""
+  __slots__ = ()
+
+  def __init__(self):
+    for method in self.__slots__:
+      setattr(self, method, _Spy('%s.%s' % (type(self).__name__, method)))
+
+
+_spy_obj_types = {}
 
 
 def create_spy(name):
-  return _JazzMock(spec=__callable, name=name)
+  """Creates a spy function.
+
+  Args:
+    name: The name of the spy, for messages.
+  Returns:
+    A callable which records its calls for the have been called matchers.
+  """
+  return _Spy(name)
 
 
 def create_spy_obj(name, methods):
-  t = collections.namedtuple(name, methods)
-  s = t(*(__callable,) * len(methods))
-  return _JazzMock(spec=s, name=name)
+  """Creates an object with spy methods.
+
+  Args:
+    name: The name of the object, for messages.
+    methods: A list of the names of its methods.
+  Returns:
+    An object whose methods are spies. Other attributes do not exist.
+  """
+  key = (name, tuple(methods))
+  spy_obj_type = _spy_obj_types.get(key)
+  if spy_obj_type is None:
+    spy_obj_type = type(name, (_SpyObj,), {'__slots__': key[1]})
+    _spy_obj_types[key] = spy_obj_type
+  return spy_obj_type()
 
 
 def _raise(actual, expected=Exception):
@@ -264,7 +727,37 @@ def _raise(actual, expected=Exception):
     return False
 
 
+def _run_faster_than(actual, seconds, repeat=3):
+  """Helps test that a function is fast.
+
+  The best of repeat calls counts, so that one call slowed down by something
+  else does not fail the match.
+
+  Args:
+    actual: Callable that is suspected to be slow.
+    seconds: The time the call must take less than.
+    repeat: How many times to call actual.
+  Returns:
+    True if the best call was faster; otherwise a _Mismatch with its time.
+  """
+  best = min(timeit.Timer(actual).repeat(repeat, 1))
+  if best < seconds:
+    return True
+  return _Mismatch('The best of %d calls took %s.' % (
+      repeat, _format_seconds(best)))
+
+
+def _format_seconds(seconds):
+  """Formats a duration with a unit that suits it, e.g. '1.234ms'."""
+  for unit, scale in (('s', 1), ('ms', 1e3)):
+    if seconds >= 1 / scale:
+      return '%.3f%s' % (seconds * scale, unit)
+  return '%.3fus' % (seconds * 1e6)
+
+
 def _have_been_called_with(actual, *args, **kwargs):
+  if isinstance(actual, _Spy):
+    return actual.called_with(args, kwargs)
   try:
     actual.assert_any_call(*args, **kwargs)
   except AssertionError:
@@ -272,6 +765,220 @@ def _have_been_called_with(actual, *args, **kwargs):
   return True
 
 
+def _have_length(actual, expected):
+  """Checks the length of a sized object or an iterable.
+
+  Iterables without a length are counted lazily, up to one past the expected
+  length at most.
+
+  Args:
+    actual: A sized object or an iterable.
+    expected: The expected length.
+  Returns:
+    True if actual has the expected length; False otherwise.
+  """
+  if hasattr(actual, '__len__'):
+    return len(actual) == expected
+  return sum(1 for _ in itertools.islice(actual, expected + 1)) == expected
+
+
+def _contain_all(actual, expected):
+  """Checks that an iterable contains every one of some items.
+
+  The iterable is consumed only until every item was seen.
+
+  Args:
+    actual: An iterable.
+    expected: The items to be seen, as many times as they are listed.
+  Returns:
+    True if every item was seen; False otherwise.
+  """
+  expected = list(expected)
+  if not expected:
+    return True
+  try:
+    _check_indexable(expected)
+    remaining = collections.Counter(expected)
+  except TypeError:
+    remaining = expected
+    for item in actual:
+      if item in remaining:
+        remaining.remove(item)
+        if not remaining:
+          break
+    return not remaining
+  left = sum(remaining.itervalues())
+  for item in actual:
+    try:
+      count = remaining.get(item)
+    except TypeError:
+      continue
+    if count:
+      remaining[item] = count - 1
+      left -= 1
+      if not left:
+        break
+  return not left
+
+
+def _contain_in_order(actual, expected):
+  """Checks that an iterable contains some items in order.
+
+  Other items may come between them. The iterable is consumed only until the
+  last item was seen.
+
+  Args:
+    actual: An iterable.
+    expected: The items to be seen, in order.
+  Returns:
+    True if every item was seen in order; False otherwise.
+  """
+  expected = iter(expected)
+  sentinel = object()
+  wanted = next(expected, sentinel)
+  if wanted is sentinel:
+    return True
+  for item in actual:
+    if item == wanted:
+      wanted = next(expected, sentinel)
+      if wanted is sentinel:
+        return True
+  return False
+
+
+class _Mismatch(object):
+  """A failed match, which explains why it failed.
+
+  Matchers may return one instead of False. It is falsy, and its details are
+  added to the assertion message, so they should be kept short.
+  """
+
+  def __init__(self, details):
+    self.details = details
+
+  def __nonzero__(self):
+    return False
+
+  def __str__(self):
+    return self.details
+
+
+_MAX_DIFFS = 10
+_MAX_DIFFLIB_LINES = 1000
+_DIFF_TIME_LIMIT = 0.1
+
+
+def _diff_lines(actual, expected):
+  """Compares two multi-line strings in unified diff style.
+
+  Args:
+    actual: The actual string.
+    expected: The expected string.
+  Yields:
+    Lists of '-' (expected) and '+' (actual) prefixed lines, one per hunk.
+  """
+  actual, expected = actual.splitlines(), expected.splitlines()
+  if max(len(actual), len(expected)) <= _MAX_DIFFLIB_LINES:
+    import difflib  # Only needed for failures.
+    hunk = []
+    for line in itertools.islice(
+        difflib.unified_diff(expected, actual, lineterm='', n=1), 2, None):
+      if line.startswith('@@') and hunk:
+        yield hunk
+        hunk = []
+      hunk.append(line)
+    if hunk:
+      yield hunk
+    return
+  # Too long for difflib to be quick: compare line by line.
+  for number, (a, e) in enumerate(itertools.izip_longest(actual, expected)):
+    if a != e:
+      yield ['@@ line %d @@' % (number + 1)] + (
+          ['-' + e] if e is not None else []) + (
+          ['+' + a] if a is not None else [])
+
+
+def _diff(actual, expected, path=''):
+  """Finds the differences between two values, depth first.
+
+  Dicts, lists, tuples and sets are compared item by item, and multi-line
+  strings line by line.
+
+  Args:
+    actual: The actual value.
+    expected: The expected value.
+    path: The path to these values from the values first compared.
+  Yields:
+    (path, lines) tuples, where lines are '-' (expected) and '+' (actual)
+    prefixed descriptions of the difference.
+  """
+  if isinstance(actual, dict) and isinstance(expected, dict):
+    for key, value in expected.iteritems():
+      key_path = '%s[%r]' % (path, key)
+      if key not in actual:
+        yield key_path, ['-%r' % (value,)]
+      elif not actual[key] == value:
+        for difference in _diff(actual[key], value, key_path):
+          yield difference
+    for key, value in actual.iteritems():
+      if key not in expected:
+        yield '%s[%r]' % (path, key), ['+%r' % (value,)]
+  elif (isinstance(actual, (list, tuple)) and
+        type(actual) is type(expected)):
+    for index, (a, e) in enumerate(itertools.izip(actual, expected)):
+      if not a == e:  # Classes without __ne__ compare != by identity.
+        for difference in _diff(a, e, '%s[%d]' % (path, index)):
+          yield difference
+    for index in xrange(len(actual), len(expected)):
+      yield '%s[%d]' % (path, index), ['-%r' % (expected[index],)]
+    for index in xrange(len(expected), len(actual)):
+      yield '%s[%d]' % (path, index), ['+%r' % (actual[index],)]
+  elif (isinstance(actual, (set, frozenset)) and
+        isinstance(expected, (set, frozenset))):
+    for item in expected - actual:
+      yield path, ['-%r' % (item,)]
+    for item in actual - expected:
+      yield path, ['+%r' % (item,)]
+  elif (isinstance(actual, basestring) and isinstance(expected, basestring) and
+        ('\n' in actual or '\n' in expected)):
+    for hunk in _diff_lines(actual, expected):
+      yield path, hunk
+  else:
+    yield path, ['-%r' % (expected,), '+%r' % (actual,)]
+
+
+def _equal(actual, expected):
+  """Checks that two values are equal, explaining how they differ if not.
+
+  The explanation lists at most _MAX_DIFFS differences, and stops early once
+  finding them took more than _DIFF_TIME_LIMIT seconds.
+
+  Args:
+    actual: The actual value.
+    expected: The expected value.
+  Returns:
+    True if the values are equal; otherwise False or, for dicts, lists,
+    tuples, sets and multi-line strings, a _Mismatch.
+  """
+  if actual == expected:
+    return True
+  if not isinstance(actual, (dict, list, tuple, set, frozenset, basestring)):
+    return False
+  deadline = time.time() + _DIFF_TIME_LIMIT
+  lines = ['Differences (-expected +actual):']
+  for count, (path, diff) in enumerate(_diff(actual, expected)):
+    if count == _MAX_DIFFS or time.time() > deadline:
+      lines.append('...')
+      break
+    if path:
+      lines.append(path)
+    lines.extend('  %s' % _truncate(line) for line in diff)
+  if len(lines) == 1:
+    lines.extend('  %s' % _truncate(line)
+                 for line in ('-%r' % (expected,), '+%r' % (actual,)))
+  return _Mismatch('\n'.join(lines))
+
+
 _MATCHERS = {
   'be': lambda a, e:
     a is e,
@@ -288,12 +995,12 @@ _MATCHERS = {
     a is None,
   'be truthy': lambda a:
     a,
-  'equal': lambda a, e:
-    a == e,
+  'equal': _equal,
   'match': lambda a, e:
     re.match(e, a),
   # Callable
   'raise': _raise,
+  'run faster than': _run_faster_than,
   # Mock
   'have been called with': _have_been_called_with,
   'have been called': lambda a:
@@ -301,17 +1008,152 @@ _MATCHERS = {
   # Iterables
   'contain': lambda a, e:
     e in a,
-  'have length': lambda a, e:
-    len(list(a)) == e,
+  'contain all': _contain_all,
+  'contain in order': _contain_in_order,
+  'have length': _have_length,
 }
 
 
+_MAX_ARRAY_MISMATCHES = 5
+_ARRAY_CHUNK_SIZE = 1 << 16
+
+
+def _array_mismatch(actual, expected, equal):
+  """Describes where two arrays differ.
+
+  Args:
+    actual: The actual array.
+    expected: The expected array.
+    equal: A boolean array, True where the elements are considered equal.
+  Returns:
+    True if every element is equal; otherwise a _Mismatch listing the first
+    _MAX_ARRAY_MISMATCHES differing elements.
+  """
+  import numpy
+  if equal.all():
+    return True
+  count = equal.size - numpy.count_nonzero(equal)
+  details = ', '.join(
+      '%s: %r != %r' % (index, actual[index], expected[index])
+      for index in _first_mismatches(equal, _MAX_ARRAY_MISMATCHES))
+  return _Mismatch('%d/%d elements differ: %s%s' % (
+      count, equal.size, details,
+      ', ...' if count > _MAX_ARRAY_MISMATCHES else ''))
+
+
+def _first_mismatches(equal, limit):
+  """Finds the first elements of an array that are not considered equal.
+
+  The array is searched in chunks, so that finding a few elements of a large
+  array does not index every one of them.
+
+  Args:
+    equal: A boolean array, True where the elements are considered equal.
+    limit: The most elements to find.
+  Returns:
+    A list of the index tuples of the elements, in order.
+  """
+  import numpy
+  if not equal.ndim:
+    return [] if equal else [()]
+  flat = equal.reshape(-1)
+  indices = []
+  for start in xrange(0, flat.size, _ARRAY_CHUNK_SIZE):
+    chunk = flat[start:start + _ARRAY_CHUNK_SIZE]
+    indices.extend(numpy.flatnonzero(~chunk)[:limit - len(indices)] + start)
+    if len(indices) >= limit:
+      break
+  return zip(*numpy.unravel_index(indices, equal.shape))
+
+
+def _be_all_close_to(actual, expected, rtol=1e-05, atol=1e-08):
+  """Checks that two arrays have the same shape and are close element-wise.
+
+  Args:
+    actual: An array, or anything NumPy can make an array of.
+    expected: The expected array.
+    rtol: The relative tolerance.
+    atol: The absolute tolerance.
+  Returns:
+    True if the arrays are close; a _Mismatch otherwise.
+  """
+  import numpy
+  actual, expected = numpy.asarray(actual), numpy.asarray(expected)
+  if actual.shape != expected.shape:
+    return _Mismatch('Shape %s != %s.' % (actual.shape, expected.shape))
+  return _array_mismatch(actual, expected,
+                         numpy.isclose(actual, expected, rtol=rtol, atol=atol))
+
+
+def _equal_array(actual, expected):
+  """Checks that two arrays have the same shape and elements.
+
+  Args:
+    actual: An array, or anything NumPy can make an array of.
+    expected: The expected array.
+  Returns:
+    True if the arrays are equal; a _Mismatch otherwise.
+  """
+  import numpy
+  actual, expected = numpy.asarray(actual), numpy.asarray(expected)
+  if actual.shape != expected.shape:
+    return _Mismatch('Shape %s != %s.' % (actual.shape, expected.shape))
+  equal = numpy.asarray(actual == expected)
+  if equal.shape != actual.shape:  # NumPy could not compare element-wise.
+    return _Mismatch('Dtypes %s and %s are not comparable.' % (
+        actual.dtype, expected.dtype))
+  return _array_mismatch(actual, expected, equal)
+
+
+def _have_shape(actual, expected):
+  import numpy
+  return numpy.shape(actual) == tuple(expected)
+
+
+def _have_dtype(actual, expected):
+  import numpy
+  return numpy.asarray(actual).dtype == numpy.dtype(expected)
+
+
+def _add_array_matchers():
+  """Adds the NumPy array matchers if NumPy is installed.
+
+  NumPy itself is only imported once an array matcher is used.
+  """
+  try:
+    imp.find_module('numpy')
+  except ImportError:
+    return
+  _MATCHERS.update({
+      'be all close to': _be_all_close_to,
+      'equal array': _equal_array,
+      'have shape': _have_shape,
+      'have dtype': _have_dtype,
+  })
+
+_add_array_matchers()
+
+
+_pretty_names = {}
+_MAX_PRETTY_NAMES = 10000
+
+
 def _convert_name(name):
-  """Creates a pretty name for suites and specs."""
-  name = name.replace('_', ' ')
-  name = re.sub('(.)([A-Z][a-z]+)', r'\1 \2', name)
-  name = re.sub('([a-z0-9])([A-Z])', r'\1 \2', name)
-  return name.lstrip('it ').lstrip('iit ').strip()
+  """Creates a pretty name for suites and specs.
+
+  Pretty names are memoized by name, as the same suites and specs are named
+  again on every run.
+  """
+  pretty_name = _pretty_names.get(name)
+  if pretty_name is None:
+    pretty_name = name.replace('_', ' ')
+    pretty_name = re.sub('(.)([A-Z][a-z]+)', r'\1 \2', pretty_name)
+    pretty_name = re.sub('([a-z0-9])([A-Z])', r'\1 \2', pretty_name)
+    pretty_name = re.sub('^i?it ', '', pretty_name).strip()
+    if len(_pretty_names) >= _MAX_PRETTY_NAMES:
+      _pretty_names.clear()
+    _pretty_names[name] = pretty_name
+  return pretty_name
 
 
 def _get_name(value):
@@ -334,6 +1176,53 @@ def _get_name(value):
   return name
 
 
+def _truncate(text):
+  """Shortens text to at most MAX_REPR_SIZE characters, if set.
+
+  Args:
+    text: A string.
+  Returns:
+    The string, or its start and a note of how much was cut.
+  """
+  if MAX_REPR_SIZE and len(text) > MAX_REPR_SIZE:
+    return '%s...<%d more>' % (text[:MAX_REPR_SIZE], len(text) - MAX_REPR_SIZE)
+  return text
+
+
+_BOUNDED_TYPES = (dict, list, tuple, set, frozenset, collections.deque)
+
+
+def _shorten(value):
+  """Gets str(value), shortened to at most MAX_REPR_SIZE characters, if set.
+
+  Built-in containers are only rendered as far as they are shown, so that a
+  huge one costs little to describe.
+
+  Args:
+    value: Any value.
+  Returns:
+    The string, or its start followed by '...'.
+  """
+  if not MAX_REPR_SIZE or type(value) not in _BOUNDED_TYPES:
+    return _truncate(str(value))
+  bounded = reprlib.Repr()
+  bounded.maxtuple = bounded.maxlist = bounded.maxarray = bounded.maxset = (
+      bounded.maxfrozenset) = bounded.maxdeque = max(1, MAX_REPR_SIZE // 4)
+  bounded.maxdict = max(1, MAX_REPR_SIZE // 8)
+  bounded.maxstring = bounded.maxlong = bounded.maxother = MAX_REPR_SIZE
+  text = bounded.repr(value)
+  if len(text) > MAX_REPR_SIZE:
+    return '%s...' % text[:MAX_REPR_SIZE]
+  return text
+
+
+def _describe(value):
+  """Gets a pretty name for a value, shortened for messages."""
+  if callable(value) or isinstance(value, types.ModuleType):
+    return _truncate(_get_name(value))
+  return _shorten(value)
+
+
 def _get_matcher_name(name):
   """Converts a function name to a string key for a matcher."""
   return re.sub(r'([A-Z])', r' \1', name).lower().replace('_', ' ').strip()
@@ -341,20 +1230,129 @@ def _get_matcher_name(name):
 
 _expectation_id = itertools.count()
 _unasserted_expectations = set()
+_resolved_matchers = {}
+
+
+def _drain_unasserted_expectations():
+  """Forgets every unasserted expectation.
+
+  Returns:
+    A list of the expectations that were unasserted, in creation order.
+  """
+  expectations = sorted(_unasserted_expectations, key=lambda e: e._id)
+  _unasserted_expectations.clear()
+  return expectations
+
+
+def _isolated(coroutine, expectations):
+  """Keeps the unasserted expectations of a coroutine apart from the others.
+
+  The coroutine runs with expectations as the unasserted expectations each time
+  it is resumed, as do the coroutines it waits for.
+
+  Args:
+    coroutine: The coroutine to isolate.
+    expectations: The set of the coroutine's unasserted expectations.
+  Yields:
+    What the coroutine yields, for the event loop.
+  """
+  global _unasserted_expectations
+  resume = coroutine.next
+  while True:
+    others, _unasserted_expectations = _unasserted_expectations, expectations
+    try:
+      waited = resume()
+    except StopIteration as exc:
+      # A trollius Return is a StopIteration too; pass its value on.
+      exc.raised = True
+      raise _asyncio().Return(getattr(exc, 'value', None))
+    finally:
+      _unasserted_expectations = others
+    if _is_coroutine(waited):
+      waited = _isolated(waited, expectations)
+    try:
+      value = yield waited
+      resume = lambda: coroutine.send(value)
+    except Exception:
+      exc_info = sys.exc_info()
+      resume = lambda: coroutine.throw(*exc_info)
+
+
+def _clear_resolved_matchers():
+  """Forgets every resolved matcher so that it is looked up again.
+
+  This removes the matcher methods generated on _Expectation as well, and must
+  be called whenever _MATCHERS changes.
+  """
+  for key in _resolved_matchers:
+    delattr(_Expectation, key)
+  _resolved_matchers.clear()
+
+
+def _make_matcher_method(negate, matcher_name, matcher):
+  """Creates an expectation method that asserts a matcher.
+
+  Args:
+    negate: True if the matcher is expected not to match.
+    matcher_name: The normalized name of the matcher.
+    matcher: The matcher function.
+  Returns:
+    A function to be installed as a method of _Expectation.
+  """
+
+  def attr(self, *args, **kwargs):
+    """Asserts the matcher against the actual value.
+
+    Args:
+      *args: Any arguments to the matcher.
+      **kwargs: Any keyword arguments to the matcher.
+    """
+    if self in _unasserted_expectations:
+      _unasserted_expectations.remove(self)
+    result = matcher(self.actual, *args, **kwargs)
+    if bool(result) == negate:
+      expected = args[0] if args else None
+      msg = 'Expected %s %sto %s %s.' % (
+          _describe(self.actual), 'not ' if negate else '', matcher_name,
+          _describe(expected))
+      if isinstance(result, _Mismatch):
+        details = str(result)
+        msg = '%s%s%s' % (msg, '\n' if '\n' in details else ' ', details)
+      raise AssertionError(msg)
+    return self
+  return attr
+
 
 class _Expectation(object):
   """The expectation object for an actual value."""
   MATCHER_PATTERN = re.compile(r'^(and)?_?((n|N)ot)?_?(t|T)o_?(\w+)$')
 
-  def __init__(self, actual):
-    """Stores the actual value for multiple assertions."""
+  def __init__(self, actual, depth=2):
+    """Stores the actual value for multiple assertions.
+
+    Only the caller's code object and line number are recorded here. The file
+    name and source line are looked up when the expectation is printed.
+
+    Args:
+      actual: The actual value to test.
+      depth: How many frames above this one the call site is.
+    """
     self.actual = actual
     self._id = _expectation_id.next()
-    self._traceback = traceback.extract_stack()[-3]
+    frame = sys._getframe(depth)
+    self._code, self._lineno = frame.f_code, frame.f_lineno
     _unasserted_expectations.add(self)
 
+  @property
+  def _traceback(self):
+    """The call site as a (filename, line number, name, line) tuple."""
+    filename = self._code.co_filename
+    line = linecache.getline(filename, self._lineno).strip() or None
+    return filename, self._lineno, self._code.co_name, line
+
   def __str__(self):
-    return 'expect({})@{}:{}<{}:{}>'.format(str(self.actual), *self._traceback)
+    return 'expect({})@{}:{}<{}:{}>'.format(
+        _shorten(self.actual), *self._traceback)
 
   def __hash__(self):
     return hash(self._id)
@@ -365,6 +1363,9 @@ class _Expectation(object):
   def __getattr__(self, key):
     """Gets a matcher by its name by parsing the attribute requested.
 
+    The first lookup of a name resolves it and installs the resulting method on
+    the class, so later lookups of the same name never reach here.
+
     Example:
       expect(foo).notToBeGreaterThan would yield a callable that is posed to
       check the negative match of matchers['be greater than'] against foo.
@@ -374,7 +1375,7 @@ class _Expectation(object):
     Returns:
       A function, the matcher setup for assertion.
     """
-    match = re.match(self.MATCHER_PATTERN, key)
+    match = self.MATCHER_PATTERN.match(key)
     if not match:
       raise AttributeError('Bad Matcher pattern')
     _chain, _, negate, _, matcher_name = match.groups()
@@ -383,52 +1384,40 @@ class _Expectation(object):
     if not matcher:
       raise NotImplementedError(
           'No matcher found by the name "%s".' % matcher_name)
-
-    def attr(*args, **kwargs):
-      """Sets up the matcher to be asserted with a requested matcher.
-
-      Args:
-        *args: Any arguments to the matcher.
-        **kwargs: Any keyword arguments to the matcher.
-      """
-      if self in _unasserted_expectations:
-        _unasserted_expectations.remove(self)
-      result = matcher(self.actual, *args, **kwargs)
-      expected = args[0] if args else None
-      names = (_get_name(self.actual), matcher_name, _get_name(expected))
-      if negate:
-        msg = 'Expected %s not to %s %s.' % names
-        assert not result, msg
-      else:
-        msg = 'Expected %s to %s %s.' % names
-        assert result, msg
-      return self
-    return attr
+    _resolved_matchers[key] = (bool(negate), matcher_name, matcher)
+    setattr(_Expectation, key,
+            _make_matcher_method(bool(negate), matcher_name, matcher))
+    return getattr(self, key)
 
 
 class _Cause(object):
   """Records the cause of an exception, if currently under inspection."""
   TEST_FILE = __name__ + '.py'
+  EVENT_LOOP_DIR = path.join('', 'trollius', '')
 
   def __init__(self):
     """Grabs the exception and filtered traceback if available."""
     self.exc_type, self.exc_val, trace = sys.exc_info()
     sys.exc_clear()
+    if self.exc_type is _CoroutineTimeout:
+      self.exc_type, self.exc_val = SpecTimeout, SpecTimeout(*self.exc_val.args)
     if trace:
       self.error = True
       extracted_tb = traceback.extract_tb(trace)
 
-      self.trace = itertools.ifilterfalse(
-          lambda x: x[0].endswith(self.TEST_FILE), extracted_tb)
+      self.trace = [frame for frame in extracted_tb
+                    if not frame[0].endswith(self.TEST_FILE) and
+                    self.EVENT_LOOP_DIR not in frame[0]]
     else:
       self.error = False
       self.trace = None
 
   def __str__(self):
     """Nicely outputs the cause for humans."""
-    if not self.trace:
+    if not self.error:
       return ''
-    result = '\n     %s(%s)' % (self.exc_type.__name__, self.exc_val)
+    result = '\n     %s(%s)' % (self.exc_type.__name__,
+                                 str(self.exc_val).replace('\n', '\n       '))
     if OUTPUT_STACKTRACE:
       for frame in self.trace:
         frame = list(frame)
@@ -438,109 +1427,1487 @@ class _Cause(object):
     return result
 
 
+def _spec_name(suite, spec, parents):
+  """Creates the full pretty name of a spec, including its suites.
+
+  Args:
+    suite: The suite of the spec.
+    spec: The spec.
+    parents: A genealogy list of encapsulating suites.
+  Returns:
+    A string, e.g. 'Adder > Sub should be a sub test'.
+  """
+  if parents:
+    parents = '%s > ' % ' > '.join(
+        map(_convert_name, map(lambda x: x.__name__, parents)))
+  else:
+    parents = ''
+  return '%s%s %s' % (parents, _convert_name(suite.__name__),
+                      _convert_name(spec.__name__).lower())
+
+
+def _suite_event(suite, parents):
+  """Describes a suite for reporters.
+
+  Args:
+    suite: The suite.
+    parents: A genealogy list of encapsulating suites.
+  Returns:
+    A dict of the suite's name, its parents' names and its full name.
+  """
+  parents = [_convert_name(parent.__name__) for parent in parents]
+  name = _convert_name(suite.__name__)
+  return {
+      'name': name,
+      'parents': parents,
+      'full_name': ' > '.join(parents + [name]),
+  }
+
+
 class _Result(object):
   """The result of a spec."""
 
-  def __init__(self, suite, spec, parents=None):
-    """Saves the execution state for printing."""
-    self.suite, self.spec, self.parents = suite, spec, parents
-    self.cause = _Cause()
+  def __init__(self, planned, timings=None, cause=None, benchmark=None):
+    """Saves the execution state for printing.
+
+    Args:
+      planned: The _PlannedSpec that ran.
+      timings: A dict of the seconds taken by each of 'before_each', 'spec' and
+        'after_each'.
+      cause: The _Cause of the spec's failure. It is taken from the exception
+        currently handled if not given.
+      benchmark: The statistics of a benchmark spec, from _time_benchmark.
+    """
+    self.suite, self.spec, self.parents = (
+        planned.suite, planned.spec, planned.parents)
+    self.name = planned.name
+    self.timings = timings or {}
+    self.duration = sum(self.timings.itervalues())
+    self.cause = cause if cause is not None else _Cause()
+    self.benchmark = benchmark
+
+  @property
+  def over_budget(self):
+    """True if the spec took longer than the BUDGET."""
+    return BUDGET is not None and self.duration > BUDGET
+
+  def as_event(self):
+    """Describes the result for reporters.
+
+    Returns:
+      A dict of plain values, safe to serialize or send between processes.
+    """
+    event = _suite_event(self.suite, self.parents)
+    event.update({
+        'suite': event.pop('full_name'),
+        'name': _convert_name(self.spec.__name__).lower(),
+        'status': 'failed' if self.cause.error else 'passed',
+        'duration': self.duration,
+        'timings': self.timings,
+        'over_budget': self.over_budget,
+    })
+    if self.benchmark:
+      event['benchmark'] = self.benchmark
+    event['full_name'] = '%s %s' % (event['suite'], event['name'])
+    if self.cause.error:
+      event.update({
+          'error': self.cause.exc_type.__name__,
+          'message': str(self.cause.exc_val),
+          'trace': [list(frame) for frame in self.cause.trace],
+      })
+    return event
 
   def __str__(self):
     """Nicely outputs the result for humans."""
-    if self.parents:
-      parents = '%s > ' % ' > '.join(
-          map(_convert_name, map(lambda x: x.__name__, self.parents)))
-    else:
-      parents = ''
     status = '!!' if self.cause.error else 'OK'
-    return '[%s] %s%s %s.%s' % (
-        status, parents, _convert_name(self.suite.__name__),
-        _convert_name(self.spec.__name__).lower(), self.cause)
+    slow = ' [SLOW %.3fs]' % self.duration if self.over_budget else ''
+    if self.benchmark:
+      slow += ' [min %s, median %s, stddev %s of %d x %d runs]' % (
+          _format_seconds(self.benchmark['min']),
+          _format_seconds(self.benchmark['median']),
+          _format_seconds(self.benchmark['stddev']),
+          self.benchmark['repeat'], self.benchmark['number'])
+    return '[%s] %s.%s%s' % (status, self.name, slow, self.cause)
 
 
-class _SuiteRunner(object):
-  """Runs a set of Jazz suites."""
+class Reporter(object):
+  """The base class for a Jazz reporter.
 
-  def __init__(self, suites):
-    """Sets up the runner.
+  Like a Jasmine reporter, it is notified as the run progresses. Every event is
+  a dict of plain values. Override only the methods you need.
+  """
 
-    Args:
-      suites: A list of suites to run.
-    """
-    self.suites = suites
+  def jazz_started(self, event):
+    """Called before any suite runs."""
 
-  def _run_one(self, suite, parents=None, excluded=False,
-               before_each=None, after_each=None, solo=False):
-    """Runs a single suite.
+  def suite_started(self, event):
+    """Called before a suite (or nested suite) runs."""
+
+  def spec_done(self, event):
+    """Called with the result of each spec that ran."""
+
+  def suite_done(self, event):
+    """Called after a suite (and its nested suites) ran."""
+
+  def jazz_done(self, event):
+    """Called with the totals once every suite ran."""
+
+
+class JsonLinesReporter(Reporter):
+  """Writes every event as a line of JSON to a file as it happens."""
+
+  def __init__(self, filename):
+    """Opens the report file.
+
+    Args:
+      filename: The path to write the report to.
+    """
+    import json  # Only needed when reporting.
+    self._dumps = json.dumps
+    self.file = open(filename, 'w')
+
+  def _write(self, name, event):
+    self.file.write(self._dumps(dict(event, event=name)) + '\n')
+
+  def jazz_started(self, event):
+    self._write('jazz_started', event)
+
+  def suite_started(self, event):
+    self._write('suite_started', event)
+
+  def spec_done(self, event):
+    self._write('spec_done', event)
+
+  def suite_done(self, event):
+    self._write('suite_done', event)
+    self.file.flush()
+
+  def jazz_done(self, event):
+    self._write('jazz_done', event)
+    self.file.flush()
+
+  def close(self):
+    self.file.close()
+
+
+class JUnitXmlReporter(Reporter):
+  """Writes spec results as JUnit XML to a file as they happen.
+
+  Each top level suite becomes a <testsuite> and each spec a <testcase> of it,
+  named after its nested suites.
+  """
+
+  def __init__(self, filename):
+    """Opens the report file.
+
+    Args:
+      filename: The path to write the report to.
+    """
+    from xml.sax import saxutils  # Only needed when reporting.
+    self._escape, self._quoteattr = saxutils.escape, saxutils.quoteattr
+    self.file = open(filename, 'w')
+    self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n')
+
+  def suite_started(self, event):
+    if not event['parents']:
+      self.file.write('  <testsuite name=%s>\n' % self._quoteattr(
+          event['name']))
+
+  def spec_done(self, event):
+    self.file.write('    <testcase classname=%s name=%s time="%.6f"' % (
+        self._quoteattr(event['suite']), self._quoteattr(event['name']),
+        event['duration']))
+    if event['status'] == 'passed':
+      self.file.write('/>\n')
+      return
+    trace = ''.join('%s:%d in %s\n  %s\n' % tuple(frame)
+                    for frame in event['trace'])
+    self.file.write('>\n      <failure type=%s message=%s>%s</failure>\n'
+                    '    </testcase>\n' % (
+                        self._quoteattr(event['error']),
+                        self._quoteattr(event['message']),
+                        self._escape(trace)))
+
+  def suite_done(self, event):
+    if not event['parents']:
+      self.file.write('  </testsuite>\n')
+      self.file.flush()
+
+  def close(self):
+    self.file.write('</testsuites>\n')
+    self.file.close()
+
+
+class _RecordingReporter(Reporter):
+  """Records events so they can be replayed to other reporters."""
+
+  def __init__(self):
+    self.events = []
+
+  def suite_started(self, event):
+    self.events.append(('suite_started', event))
+
+  def spec_done(self, event):
+    self.events.append(('spec_done', event))
+
+  def suite_done(self, event):
+    self.events.append(('suite_done', event))
+
+
+class _Console(object):
+  """Buffers the runner's console output.
+
+  Text is written to sys.stdout in batches: when flushed explicitly (at suite
+  boundaries), before a spec once FLUSH_INTERVAL seconds passed since the last
+  flush, or at once for failures. A spec that hangs thus holds back at most
+  the passing specs of the last FLUSH_INTERVAL.
+  """
+  FLUSH_INTERVAL = 1.0
+
+  def __init__(self):
+    self._buffer = []
+    self._last_flush = time.time()
+
+  def write(self, text, now=False):
+    """Buffers some text.
+
+    Args:
+      text: The text to write.
+      now: True to write it out at once, with everything buffered before it.
+    """
+    self._buffer.append(text)
+    if now:
+      self.flush()
+
+  def tick(self):
+    """Flushes if it has been a while, before a spec runs."""
+    if time.time() - self._last_flush > self.FLUSH_INTERVAL:
+      self.flush()
+
+  def flush(self):
+    """Writes out everything buffered so far."""
+    if self._buffer:
+      sys.stdout.write(''.join(self._buffer))
+      sys.stdout.flush()
+      self._buffer = []
+    self._last_flush = time.time()
+
+
+_WORKER_RUNNER = None
+
+
+def _run_in_worker(index):
+  """Runs one top level suite of _WORKER_RUNNER inside a worker process.
+
+  The worker inherits the runner (and every registered suite) when the process
+  pool forks, so only the index of the suite has to be sent over.
+
+  Args:
+    index: The index of the suite in the runner's plan.
+  Returns:
+    A dict of the printed output, the reporter events, and the failures, spec
+    count, timings, outcomes, memory use and recorded impact of the suite's
+    specs.
+  """
+  runner = _WORKER_RUNNER
+  runner.failures = 0
+  runner.spec_count = 0
+  runner.slowest = []
+  runner.allocations = []
+  runner.retained = {}
+  runner.suite_objects = {}
+  runner.over_budget = []
+  runner.impact = {}
+  runner.outcomes = {}
+  runner.benchmarks = {}
+  recorder = _RecordingReporter()
+  if runner.reporters:
+    runner.reporters = [recorder]
+  stdout, sys.stdout = sys.stdout, cStringIO.StringIO()
+  try:
+    runner._run_one(runner.plan[index])
+    runner.console.flush()
+    output = sys.stdout.getvalue()
+  finally:
+    sys.stdout = stdout
+  return {
+      'index': index,
+      'output': output,
+      'events': recorder.events,
+      'failures': runner.failures,
+      'spec_count': runner.spec_count,
+      'slowest': runner.slowest,
+      'allocations': runner.allocations,
+      'retained': runner.retained,
+      'suite_objects': runner.suite_objects,
+      'over_budget': runner.over_budget,
+      'impact': runner.impact,
+      'outcomes': runner.outcomes,
+      'benchmarks': runner.benchmarks,
+  }
+
+
+def _asyncio():
+  """Imports the event loop library that coroutine specs run with.
+
+  Returns:
+    The trollius module, the port of asyncio to Python 2.
+  """
+  import trollius  # Only needed for coroutine specs.
+  return trollius
+
+
+def _is_coroutine(value):
+  """Checks whether a spec or its setup or tear down returned a coroutine."""
+  return isinstance(value, types.GeneratorType)
+
+
+def _start_watchdog(seconds):
+  """Interrupts the running code with a SpecTimeout once seconds have passed.
+
+  The watchdog is a SIGALRM timer, so there is none on platforms without it or
+  outside of the main thread. The stack of the SpecTimeout shows where the code
+  was stuck.
+
+  Args:
+    seconds: The seconds to wait, or None for no watchdog.
+  Returns:
+    The previous SIGALRM handler, to restore with _stop_watchdog, or None if
+    the watchdog did not start.
+  """
+  if not seconds or not hasattr(signal, 'setitimer'):
+    return None
+
+  def expire(signum, frame):
+    raise SpecTimeout('Timed out after %gs.' % seconds)
+
+  try:
+    previous = signal.signal(signal.SIGALRM, expire)
+  except ValueError:  # Signals are only handled in the main thread.
+    return None
+  signal.setitimer(signal.ITIMER_REAL, seconds)
+  # A handler that was not set from Python cannot be restored.
+  return signal.SIG_DFL if previous is None else previous
+
+
+def _stop_watchdog(previous):
+  """Stops the watchdog before it expires.
+
+  Args:
+    previous: The SIGALRM handler to restore, from _start_watchdog.
+  """
+  signal.setitimer(signal.ITIMER_REAL, 0)
+  signal.signal(signal.SIGALRM, previous)
+
+
+def _watched(seconds, function, *args, **kwargs):
+  """Calls a function of a spec with a timeout.
+
+  The call runs under the watchdog, and a coroutine it returns is _timed.
+
+  Args:
+    seconds: The timeout in seconds, or None for no timeout.
+    function: The function to call.
+    *args: The positional arguments of the call.
+    **kwargs: The keyword arguments of the call.
+  Returns:
+    The return value of the function.
+  """
+  previous = _start_watchdog(seconds)
+  try:
+    result = function(*args, **kwargs)
+  finally:
+    if previous is not None:
+      _stop_watchdog(previous)
+  if seconds and _is_coroutine(result):
+    result = _timed(result, seconds)
+  return result
+
+
+def _timed(coroutine, seconds):
+  """Makes a coroutine fail with a timeout once seconds have passed.
+
+  The event loop keeps running other coroutines meanwhile, so this is used
+  instead of the watchdog for coroutines. The timeout is a _CoroutineTimeout,
+  raised outside of the coroutine so that it cannot swallow it.
+
+  Args:
+    coroutine: The coroutine of a spec.
+    seconds: The seconds to wait.
+  Yields:
+    The coroutine, for the event loop.
+  """
+  asyncio = _asyncio()
+  task = asyncio.Task.current_task()
+  expired = []
+
+  def expire():
+    expired.append(True)
+    task.cancel()
+
+  timer = asyncio.get_event_loop().call_later(seconds, expire)
+  try:
+    yield asyncio.From(coroutine)
+  except asyncio.CancelledError:
+    if not expired:
+      raise
+    raise _CoroutineTimeout('Timed out after %gs.' % seconds)
+  finally:
+    timer.cancel()
+
+
+def _batches(plan):
+  """Splits the plan of a top level suite into batches of specs to run.
+
+  Independent specs next to each other in the same suite make a batch of
+  specs to run concurrently. Any other spec is a batch of its own.
+
+  Args:
+    plan: The list of _PlannedSpec of the suite.
+  Yields:
+    The lists of _PlannedSpec of each batch.
+  """
+  for suite, specs in itertools.groupby(plan, lambda planned: (
+      getattr(planned.spec, 'independent', False) and planned.suite)):
+    if suite:
+      yield list(specs)
+    else:
+      for planned in specs:
+        yield [planned]
+
+
+def _failed_first(plan, failed, depth=0):
+  """Moves the failed specs of a suite first, and the nested suites with any.
+
+  The specs of each nested suite stay together, so that it is entered once.
+
+  Args:
+    plan: The list of _PlannedSpec of the suite.
+    failed: A function that checks if a _PlannedSpec failed in the last run.
+    depth: The number of suites around the suite.
+  Returns:
+    The reordered list of _PlannedSpec.
+  """
+  def block_key(planned):
+    if len(planned.parents) > depth:
+      return (planned.parents + (planned.suite,))[depth + 1]
+    return planned
+
+  blocks = []
+  for key, block in itertools.groupby(plan, block_key):
+    block = list(block)
+    if key is not block[0]:
+      block = _failed_first(block, failed, depth + 1)
+    blocks.append(block)
+  blocks.sort(key=lambda block: not any(map(failed, block)))
+  return [planned for block in blocks for planned in block]
+
+
+def _spec_key(planned):
+  """Gets a key for a spec that stays the same from one invocation to the next.
+
+  Args:
+    planned: The _PlannedSpec.
+  Returns:
+    A string of the spec's module and its full pretty name.
+  """
+  return '%s: %s' % (planned.suite.__module__, planned.name)
+
+
+def _top_suite_name(planned):
+  """Gets the pretty name of the top level suite of a spec."""
+  return _convert_name((planned.parents + (planned.suite,))[0].__name__)
+
+
+def _fingerprint(filename):
+  """Gets the modification time and size of a file, or None if it is gone."""
+  try:
+    return [path.getmtime(filename), path.getsize(filename)]
+  except OSError:
+    return None
+
+
+def _load_impact_index(filename):
+  """Loads an impact index and finds the files changed since it was saved.
+
+  Args:
+    filename: The path to the impact index.
+  Returns:
+    A (specs, changed files) tuple. specs maps spec keys to the files they
+    ran, and is None if there is no readable index.
+  """
+  import json  # Only needed for impact selection.
+  try:
+    with open(filename) as index_file:
+      index = json.load(index_file)
+  except (IOError, ValueError):
+    return None, set()
+  changed = set(name for name, fingerprint in index['files'].iteritems()
+                if _fingerprint(name) != fingerprint)
+  return index['specs'], changed
+
+
+def _save_impact_index(filename, impact):
+  """Adds the files each spec ran to an impact index.
+
+  Records of specs that did not run are kept, and every file of the index is
+  fingerprinted again.
+
+  Args:
+    filename: The path to the impact index.
+    impact: A dict of the files each spec ran, by spec key.
+  """
+  import json  # Only needed for impact selection.
+  specs, _ = _load_impact_index(filename)
+  specs = specs or {}
+  for key, files in impact.iteritems():
+    specs[key] = sorted(set(
+        path.abspath(name) for name in files if path.isfile(name)))
+  files = set(name for spec_files in specs.itervalues() for name in spec_files)
+  with open(filename, 'w') as index_file:
+    json.dump({
+        'specs': specs,
+        'files': dict((name, _fingerprint(name)) for name in files),
+    }, index_file)
+
+
+def _load_cache(filename):
+  """Loads the outcomes of specs kept by previous runs.
+
+  Args:
+    filename: The path to the cache file, or to the benchmark baseline.
+  Returns:
+    A dict of the outcomes of each spec, by spec key. It is empty if there is
+    no readable file.
+  """
+  import json  # Only needed for the cache.
+  try:
+    with open(filename) as cache_file:
+      return json.load(cache_file)
+  except (IOError, ValueError):
+    return {}
+
+
+def _save_cache(filename, outcomes):
+  """Adds the outcomes of the specs that ran to the cache file.
+
+  Args:
+    filename: The path to the cache file, or to the benchmark baseline.
+    outcomes: A dict of the outcomes of each spec, by spec key.
+  """
+  import json  # Only needed for the cache.
+  cache = _load_cache(filename)
+  cache.update(outcomes)
+  with open(filename, 'w') as cache_file:
+    json.dump(cache, cache_file)
+
+
+_BENCHMARK_MIN_TIME = 0.01
+
+
+def _time_benchmark(fn, warmup, repeat, number):
+  """Times a benchmark.
+
+  Args:
+    fn: The function to time.
+    warmup: How many times to call fn before timing it.
+    repeat: How many times to time fn.
+    number: How many calls of fn to time together, or None for enough calls
+      to take at least _BENCHMARK_MIN_TIME.
+  Returns:
+    A dict of the 'min', 'median' and 'stddev' seconds a call took, and of the
+    'repeat' and 'number' of calls timed.
+  """
+  for _ in xrange(warmup):
+    fn()
+  timer = timeit.Timer(fn, timer=timeit.default_timer)
+  if number is None:
+    number = 1
+    while timer.timeit(number) < _BENCHMARK_MIN_TIME:
+      number *= 2
+  times = sorted(total / number for total in timer.repeat(repeat, number))
+  mean = sum(times) / repeat
+  middle = repeat // 2
+  return {
+      'min': times[0],
+      'median': (times[middle] if repeat % 2 else
+                 (times[middle - 1] + times[middle]) / 2),
+      'stddev': (sum((time - mean) ** 2 for time in times) / repeat) ** 0.5,
+      'repeat': repeat,
+      'number': number,
+  }
+
+
+def _count_objects():
+  """Collects garbage, then counts the objects the garbage collector tracks.
+
+  Atoms like numbers and strings are not tracked, so they are not counted.
+
+  Returns:
+    A dict of the number of objects by type name.
+  """
+  gc.collect()
+  counts = {}
+  for obj in gc.get_objects():
+    name = type(obj).__name__
+    counts[name] = counts.get(name, 0) + 1
+  return counts
+
+
+def _count_growth(before, after):
+  """Finds the types that have more objects after than before.
+
+  Args:
+    before: A dict of the number of objects by type name, from _count_objects.
+    after: A later dict of the number of objects by type name.
+  Returns:
+    A dict of the number of objects gained by type name.
+  """
+  return dict((name, count - before.get(name, 0))
+              for name, count in after.iteritems()
+              if count > before.get(name, 0))
+
+
+def _format_growth(growth, top=3):
+  """Formats the types that gained the most objects, e.g. 'list +10, dict +2'.
+
+  Args:
+    growth: A dict of the number of objects gained by type name.
+    top: How many types to list.
+  """
+  return ', '.join('%s +%d' % (name, count) for count, name in heapq.nlargest(
+      top, ((count, name) for name, count in growth.iteritems())))
+
+
+def _max_rss():
+  """Gets the peak resident set size of this process in KB, or 0 if unknown."""
+  try:
+    import resource  # Only needed for --memory, and missing on Windows.
+  except ImportError:
+    return 0
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# A spec as it is to be run: its suite, the genealogy tuple of encapsulating
+# suites, its pretty name, the tuples of suites whose before_each and
+# after_each functions run around it, and its timeout in seconds or None.
+_PlannedSpec = collections.namedtuple('_PlannedSpec', [
+    'suite', 'parents', 'spec', 'name', 'before_each', 'after_each',
+    'timeout'])
+
+
+class _SuiteRunner(object):
+  """Runs a set of Jazz suites."""
+
+  def __init__(self, suites, reporters=None):
+    """Sets up the runner.
+
+    Args:
+      suites: A list of suites to run.
+      reporters: A list of reporters to notify of results.
+    """
+    self.suites = suites
+    self.name_filter = re.compile(FILTER) if FILTER else None
+    self.plan = filter(None, [self._plan_suite(suite) for suite in suites
+                              if suite.top])
+    if IMPACTED:
+      self.plan = self._impacted(self.plan)
+    if CACHE_FILE and (LAST_FAILED or FAILED_FIRST):
+      self.plan = self._ordered(self.plan)
+    self.spec_total = sum(map(len, self.plan))
+    self.reporters = reporters or []
+    self.console = _Console()
+    self.max_failures = 0
+    self.baseline = None
+    self.suite_objects = {}
+
+  @property
+  def stopped(self):
+    """True once enough specs failed that no more are to run."""
+    return bool(self.max_failures) and self.failures >= self.max_failures
+
+  def _emit(self, name, event):
+    """Notifies every reporter of an event.
+
+    Args:
+      name: The name of the reporter method to call.
+      event: The event dict.
+    """
+    for reporter in self.reporters:
+      getattr(reporter, name)(event)
+
+  def _record_timings(self, result):
+    """Remembers the result's timings for the end of run report.
+
+    Args:
+      result: The _Result of a spec.
+    """
+    if SLOWEST:
+      timing = (result.duration, result.name, result.timings)
+      if len(self.slowest) < SLOWEST:
+        heapq.heappush(self.slowest, timing)
+      else:
+        heapq.heappushpop(self.slowest, timing)
+    if result.over_budget:
+      self.over_budget.append((result.duration, result.name))
+
+  def _print_timings(self):
+    """Prints the slowest specs and the specs over the budget."""
+    if SLOWEST and self.slowest:
+      print '==== SLOWEST %d SPECS ====' % len(self.slowest)
+      for duration, name, timings in sorted(self.slowest, reverse=True):
+        print '  %.3fs %s (%s)' % (duration, name, ', '.join(
+            '%s %.3fs' % (_convert_name(hook), timings[hook])
+            for hook in ('before_each', 'spec', 'after_each')))
+    if self.over_budget:
+      print '==== %d SPECS OVER THE %.3fs BUDGET ====' % (
+          len(self.over_budget), BUDGET)
+      for duration, name in self.over_budget:
+        print '  %.3fs %s' % (duration, name)
+
+  def _measure_spec(self, planned, before, after, rss):
+    """Measures the objects a spec retained.
+
+    The measures are only kept in lists of objects that the garbage collector
+    does not track, so that they are not counted in the suite's own measure.
+    Concurrent specs are measured together, so they share their allocations.
+
+    Args:
+      planned: The _PlannedSpec that ran.
+      before: The counts of objects before it ran, from _count_objects.
+      after: The counts of objects after it ran.
+      rss: The peak resident set size before it ran.
+    """
+    names, growths, rss_growths = self.measured
+    names.append(planned.name)
+    growths.append(_count_growth(before, after))
+    rss_growths.append(_max_rss() - rss)
+
+  def _record_memory(self, suite_name, suite_growth):
+    """Remembers the objects retained by a suite and its specs.
+
+    Args:
+      suite_name: The pretty name of the top level suite.
+      suite_growth: The objects gained over the suite, from _count_growth.
+    """
+    self.suite_objects.setdefault(suite_name, []).append(suite_growth)
+    retained = self.retained.setdefault(suite_name, {})
+    for name, growth, rss_growth in zip(*self.measured):
+      allocation = (sum(growth.itervalues()), rss_growth, name, growth)
+      if len(self.allocations) < MEMORY:
+        heapq.heappush(self.allocations, allocation)
+      else:
+        heapq.heappushpop(self.allocations, allocation)
+      retained[name] = growth
+
+  def _print_memory(self):
+    """Prints the specs that retained the most objects."""
+    if not self.allocations:
+      return
+    print '==== TOP %d SPECS BY RETAINED OBJECTS ====' % len(self.allocations)
+    for count, rss, name, growth in sorted(self.allocations, reverse=True):
+      print '  +%d objects%s %s (%s)' % (
+          count, ', +%dKB peak RSS' % rss if rss > 0 else '', name,
+          _format_growth(growth))
+
+  def _print_leaks(self):
+    """Prints the top level suites that leak objects across runs.
+
+    A suite leaks if there are more objects after it than before it in every
+    run but the first, which may fill caches. The specs that retained the most
+    of the leaked types in the last run are listed as suspects.
+
+    Suites run in fresh worker processes with JOBS, where every run is like
+    the first one, so leaks are only looked for in serial runs.
+    """
+    if JOBS > 1 and len(self.plan) > 1:
+      print '==== LEAKS ==== Not looked for with --jobs.'
+      return
+    leaks = []
+    for suite_name, growths in sorted(self.suite_objects.iteritems()):
+      if len(growths) < 3 or not all(growths[1:]):
+        continue
+      runs = len(growths) - 1
+      growth = {}
+      for run_growth in growths[1:]:
+        for name, count in run_growth.iteritems():
+          growth[name] = growth.get(name, 0) + count
+      leaks.append((suite_name, dict(
+          (name, count / runs) for name, count in growth.iteritems())))
+    if not leaks:
+      return
+    print '==== %d SUITES LEAKING ACROSS %d RUNS ====' % (
+        len(leaks), len(self.suite_objects.itervalues().next()))
+    for suite_name, growth in leaks:
+      print '  +%d objects per run in %s (%s)' % (
+          sum(growth.itervalues()), suite_name, _format_growth(growth))
+      suspects = heapq.nlargest(3, (
+          (sum(spec_growth.get(name, 0) for name in growth), spec_name)
+          for spec_name, spec_growth in
+          self.retained.get(suite_name, {}).iteritems()))
+      for count, spec_name in suspects:
+        if count:
+          print '    +%d of those objects retained by %s' % (count, spec_name)
+
+  def _impacted(self, plan):
+    """Narrows a plan down to the specs impacted by changed source files.
+
+    Every spec runs if the impact index is missing or has no record of one of
+    the planned specs.
+
+    Args:
+      plan: A list of the lists of _PlannedSpec of each top level suite.
+    Returns:
+      The plan, without the specs that ran no changed file when recorded.
+    """
+    specs, changed = _load_impact_index(IMPACT_INDEX)
+    planned_specs = [planned for suite_plan in plan for planned in suite_plan]
+    if specs is None or any(_spec_key(planned) not in specs
+                            for planned in planned_specs):
+      if VERBOSITY > 0:
+        print '==== IMPACT ==== %s is missing or stale, running all specs.' % (
+            IMPACT_INDEX)
+      return plan
+    if VERBOSITY > 0:
+      print '==== IMPACT ==== %d changed files.' % len(changed)
+    return filter(None, [
+        [planned for planned in suite_plan
+         if not changed.isdisjoint(specs[_spec_key(planned)])]
+        for suite_plan in plan])
+
+  def _ordered(self, plan):
+    """Orders a plan by the outcomes of the specs in the last runs.
+
+    Specs that failed last time run first with FAILED_FIRST, or alone with
+    LAST_FAILED.
+
+    Args:
+      plan: A list of the lists of _PlannedSpec of each top level suite.
+    Returns:
+      The ordered plan.
+    """
+    outcomes = _load_cache(CACHE_FILE)
+
+    def failed(planned):
+      return outcomes.get(_spec_key(planned), {}).get('failed', False)
+
+    if LAST_FAILED:
+      failed_plan = filter(None, [filter(failed, suite_plan)
+                                  for suite_plan in plan])
+      if failed_plan:
+        plan = failed_plan
+      elif VERBOSITY > 0:
+        print '==== LAST FAILED ==== No failures recorded, running all specs.'
+    if FAILED_FIRST:
+      plan = sorted([_failed_first(suite_plan, failed) for suite_plan in plan],
+                    key=lambda suite_plan: not any(map(failed, suite_plan)))
+    return plan
+
+  def _selected(self, name, tags):
+    """Checks a spec against the --filter, --tag and --exclude-tag options.
+
+    Args:
+      name: The full pretty name of the spec.
+      tags: A frozenset of the tags of the spec and of its suites.
+    Returns:
+      True if the spec is to run; False otherwise.
+    """
+    if self.name_filter and not self.name_filter.search(name):
+      return False
+    if TAGS and tags.isdisjoint(TAGS):
+      return False
+    return tags.isdisjoint(EXCLUDED_TAGS)
+
+  def _plan_suite(self, suite, parents=(), excluded=False, before_each=(),
+                  after_each=(), solo=False, tags=frozenset(), timeout=None):
+    """Lists the specs of a suite that are to run, in order.
 
     This suite may be a nested suite.
     This method is recursive for nested suites.
 
     Args:
-      suite: The suite to run.
-      parents: A genealogy list of encapsulating suites.
-      before_each: A list of setup functions to run.
-      after_each: A list of tear down functions to run.
+      suite: The suite to plan.
+      parents: A genealogy tuple of encapsulating suites.
+      excluded: True if this suite is part of an excluded suite.
+      before_each: A tuple of the suites whose setup functions run.
+      after_each: A tuple of the suites whose tear down functions run.
       solo: True if this suite is part of a solo suite.
+      tags: A frozenset of the tags of the encapsulating suites.
+      timeout: The timeout of the innermost encapsulating suite that has one.
+    Returns:
+      A list of _PlannedSpec, the specs of this suite before those of its
+      nested suites.
     """
-    before_each = before_each or []
-    after_each = after_each or []
-    parents = parents or []
-    test = suite()
-    if hasattr(test, 'before_each'):
-      before_each.append(test.before_each)
-    if hasattr(test, 'after_each'):
-      after_each.append(test.after_each)
+    if hasattr(suite, 'before_each'):
+      before_each += (suite,)
+    if hasattr(suite, 'after_each'):
+      after_each += (suite,)
 
     solo = solo or suite.solo
     excluded = (excluded or suite.excluded) and not solo
-    for spec in test.specs:
+    tags = tags.union(suite.tags)
+    if suite.timeout is not None:
+      timeout = suite.timeout
+    plan = []
+    for spec in suite.specs:
       if excluded:
         continue
       if _SOLO_MODE and not (solo or spec.solo):
         continue
-      map(lambda x: x(), before_each)
+      name = _spec_name(suite, spec, parents)
+      if not self._selected(name, tags.union(getattr(spec, 'tags', ()))):
+        continue
+      spec_timeout = getattr(spec, 'timeout', None)
+      if spec_timeout is None:
+        spec_timeout = TIMEOUT if timeout is None else timeout
+      plan.append(_PlannedSpec(
+          suite, parents, spec, name, before_each, after_each, spec_timeout))
+
+    for sub_suite in suite.suites:
+      plan.extend(self._plan_suite(
+          sub_suite, parents=parents + (suite,), before_each=before_each,
+          after_each=after_each, solo=solo, excluded=excluded, tags=tags,
+          timeout=timeout))
+    return plan
+
+  def _enter_suites(self, path, started, instances):
+    """Leaves and enters the suites on the way to a spec.
+
+    The after_all functions of the suites left and the before_all functions
+    of the suites entered run, and reporters are notified. Like in Jasmine,
+    the after_all function of a suite runs even if its before_all function
+    failed, but the suites nested in it are not entered.
+
+    Args:
+      path: A tuple of the suites of the next spec, outermost first, or an
+        empty tuple once every spec ran.
+      started: A list of (suite, event, start time, cause) for the suites that
+        were started but are not done yet, where cause is the _Cause of the
+        failure of the before_all function, if any. It is updated to match
+        path.
+      instances: A dict of the suite instances of this run by suite.
+    Returns:
+      The _Cause of the failure of a before_all function on the way, which the
+      next spec fails with, or None.
+    """
+    common = 0
+    while (common < min(len(path), len(started)) and
+           started[common][0] is path[common]):
+      common += 1
+    while len(started) > common:
+      suite, event, start, _ = started.pop()
+      error = {}
+      if hasattr(suite, 'after_all'):
+        try:
+          self._complete(self._instance(suite, instances).after_all())
+        except Exception:
+          error = self._fail_after_all(suite, [entry[0] for entry in started])
+      if self.reporters:
+        self._emit('suite_done', dict(
+            event, duration=time.time() - start, **error))
+    for _, _, _, cause in started:
+      if cause is not None:
+        return cause
+    for depth in xrange(common, len(path)):
+      suite = path[depth]
+      event = cause = None
+      if self.reporters:
+        event = _suite_event(suite, path[:depth])
+        self._emit('suite_started', event)
+      start = time.time()
+      if hasattr(suite, 'before_all'):
+        try:
+          self._complete(self._instance(suite, instances).before_all())
+        except Exception:
+          cause = _Cause()
+      started.append((suite, event, start, cause))
+      if cause is not None:
+        return cause
+    return None
+
+  def _fail_after_all(self, suite, parents):
+    """Reports the failure of the after_all function of a suite.
+
+    The failure counts as one more failed spec.
+
+    Args:
+      suite: The suite.
+      parents: A genealogy list of encapsulating suites.
+    Returns:
+      A dict of the error, for the suite_done event of the suite.
+    """
+    cause = _Cause()
+    self.failures += 1
+    self.console.write('[!!] %s after all.%s\n' % (
+        ' > '.join(_convert_name(parent.__name__)
+                   for parent in parents + [suite]), cause), now=True)
+    return {
+        'error': cause.exc_type.__name__,
+        'message': str(cause.exc_val),
+        'trace': [list(frame) for frame in cause.trace],
+    }
+
+  def _instance(self, suite, instances):
+    """Gets the instance of a suite for this run, creating it.
+
+    Args:
+      suite: The suite.
+      instances: A dict of the suite instances of this run by suite.
+    Returns:
+      The instance of the suite.
+    """
+    if suite not in instances:
+      instances[suite] = suite()
+    return instances[suite]
+
+  def _spec_steps(self, planned, instances):
+    """Runs a single spec with its setup and tear down functions.
+
+    The spec and its setup and tear down functions may return coroutines.
+    Those are yielded to be run to completion before the next step, so this
+    is itself a coroutine.
+
+    Args:
+      planned: The _PlannedSpec to run.
+      instances: A dict of the suite instances of this run by suite. Suites
+        are instantiated as they are first needed.
+    Yields:
+      The coroutines to run.
+    """
+    instance = lambda suite: self._instance(suite, instances)
+    if MEMORY:
+      objects, rss = _count_objects(), _max_rss()
+    start = timeit.default_timer()
+    before_each_done = None
+    cause = stats = None
+    try:
+      for suite in planned.before_each:
+        coroutine = _watched(planned.timeout, instance(suite).before_each)
+        if _is_coroutine(coroutine):
+          yield coroutine
+      before_each_done = timeit.default_timer()
+      if hasattr(planned.spec, 'benchmark'):
+        suite_instance = instance(planned.suite)
+        stats = _watched(planned.timeout, _time_benchmark,
+                         lambda: planned.spec(suite_instance),
+                         **planned.spec.benchmark)
+        self._check_baseline(planned, stats)
+      else:
+        coroutine = _watched(planned.timeout, planned.spec,
+                             instance(planned.suite))
+        if _is_coroutine(coroutine):
+          yield coroutine
+    except (Exception, SpecTimeout):
+      self.failures += 1
+      cause = _Cause()
+      # Expectations cut short by the failure are not reported.
+      _unasserted_expectations.clear()
+    if before_each_done is None:
+      before_each_done = timeit.default_timer()
+    self.spec_count += 1
+    spec_done = timeit.default_timer()
+    for suite in planned.after_each:
       try:
-        spec(test)
-        if len(_unasserted_expectations) > 0:
-          raise UnassertedExpectation(
-            '\n{}\n'.format(
-                '\n'.join(str(e) for e in _unasserted_expectations))
-          )
-      except Exception:
+        coroutine = _watched(planned.timeout, instance(suite).after_each)
+        if _is_coroutine(coroutine):
+          yield coroutine
+      except (Exception, SpecTimeout):
+        if cause is None:
+          self.failures += 1
+          cause = _Cause()
+    after_each_done = timeit.default_timer()
+    try:
+      if _unasserted_expectations:
+        raise UnassertedExpectation('\n{}\n'.format('\n'.join(
+            str(e) for e in _drain_unasserted_expectations())))
+    except UnassertedExpectation:
+      if cause is None:
         self.failures += 1
+        cause = _Cause()
+    if MEMORY:
+      after = _count_objects()
+      self._measure_spec(planned, objects, after, rss)
+    result = _Result(planned, cause=cause, benchmark=stats, timings={
+        'before_each': before_each_done - start,
+        'spec': spec_done - before_each_done,
+        'after_each': after_each_done - spec_done,
+    })
+    self._report(planned, result)
+
+  def _fail_unrun(self, batch, cause):
+    """Fails specs that cannot run as the before_all of a suite failed.
+
+    Args:
+      batch: The list of _PlannedSpec to fail.
+      cause: The _Cause of the failure of the before_all function.
+    """
+    for planned in batch:
+      self.failures += 1
       self.spec_count += 1
-      map(lambda x: x(), after_each)
-      result = _Result(suite, spec, parents=parents)
-      if result.cause.error or VERBOSITY > 2:
-        print result
-      elif VERBOSITY > 1:
-        print '.',
-
-    parents.append(suite)
-    for sub_suite in test.suites:
-      self._run_one(sub_suite, parents=parents, before_each=before_each,
-                   after_each=after_each, solo=solo, excluded=excluded)
-    if hasattr(test, 'before_each'):
-      before_each.pop()
-    if hasattr(test, 'after_each'):
-      after_each.pop()
-    parents.pop()
-
-  def run(self):
-    """Runs and times the suites, printing the results."""
+      if RECORD_IMPACT:
+        self.impact[_spec_key(planned)] = set()
+      self._report(planned, _Result(planned, cause=cause))
+
+  def _report(self, planned, result):
+    """Reports the result of a spec and keeps its outcome.
+
+    Args:
+      planned: The _PlannedSpec that ran.
+      result: The _Result of the spec.
+    """
+    if self.reporters:
+      self._emit('spec_done', result.as_event())
+    self._record_timings(result)
+    if CACHE_FILE:
+      self.outcomes[_spec_key(planned)] = {
+          'failed': bool(result.cause.error),
+          'duration': result.duration,
+      }
+    if result.cause.error or VERBOSITY > 2:
+      self.console.write('%s\n' % result, now=bool(result.cause.error))
+    elif VERBOSITY > 1:
+      self.console.write('. ')
+
+  def _check_baseline(self, planned, stats):
+    """Keeps the statistics of a benchmark and compares them to its baseline.
+
+    Args:
+      planned: The _PlannedSpec of the benchmark.
+      stats: The statistics of the benchmark, from _time_benchmark.
+    Raises:
+      BenchmarkRegression: If the benchmark got more than REGRESSION percent
+        slower than its baseline.
+    """
+    key = _spec_key(planned)
+    self.benchmarks[key] = stats
+    if self.baseline is None:
+      self.baseline = _load_cache(BASELINE)
+    baseline = self.baseline.get(key)
+    if baseline and stats['min'] > baseline['min'] * (1 + REGRESSION / 100.0):
+      raise BenchmarkRegression(
+          'Min %s is %.0f%% slower than the baseline min %s.' % (
+              _format_seconds(stats['min']),
+              (stats['min'] / baseline['min'] - 1) * 100,
+              _format_seconds(baseline['min'])))
+
+  def _event_loop(self):
+    """Gets the event loop of the running top level suite, creating it."""
+    if self.event_loop is None:
+      self.event_loop = _asyncio().new_event_loop()
+      _asyncio().set_event_loop(self.event_loop)
+    return self.event_loop
+
+  def _complete(self, result):
+    """Runs a coroutine returned by a suite's function on the event loop.
+
+    Args:
+      result: The return value of the function.
+    """
+    if _is_coroutine(result):
+      self._event_loop().run_until_complete(result)
+
+  def _run_spec(self, planned, instances):
+    """Runs a single spec, running its coroutines on the event loop.
+
+    Args:
+      planned: The _PlannedSpec to run.
+      instances: A dict of the suite instances of this run by suite.
+    """
+    steps = self._spec_steps(planned, instances)
+    resume = steps.next
+    while True:
+      try:
+        coroutine = resume()
+      except StopIteration:
+        return
+      try:
+        self._event_loop().run_until_complete(coroutine)
+        resume = steps.next
+      except Exception:
+        exc_info = sys.exc_info()
+        resume = lambda: steps.throw(*exc_info)
+
+  def _run_concurrently(self, batch, instances):
+    """Runs independent specs concurrently on the event loop.
+
+    Each spec gets copies of the suite instances of its own, so that their
+    setup functions cannot get in each other's way.
+
+    Args:
+      batch: The list of _PlannedSpec to run.
+      instances: A dict of the suite instances of this run by suite.
+    """
+    import copy  # Only needed for concurrent specs.
+    done, _ = self._event_loop().run_until_complete(_asyncio().wait([
+        _isolated(self._spec_steps(planned, dict(
+            (suite, copy.copy(instance))
+            for suite, instance in instances.iteritems())), set())
+        for planned in batch]))
+    for task in done:
+      task.result()
+
+  def _run_batch(self, batch, instances):
+    """Runs a batch of specs, concurrently if it has more than one.
+
+    Args:
+      batch: The list of _PlannedSpec to run.
+      instances: A dict of the suite instances of this run by suite.
+    """
+    if len(batch) > 1:
+      self._run_concurrently(batch, instances)
+    else:
+      self._run_spec(batch[0], instances)
+
+  def _run_traced(self, batch, instances):
+    """Runs a batch of specs, recording the source files it runs in impact.
+
+    Concurrent specs cannot be told apart, so each spec of the batch is
+    recorded as running every file of the batch.
+
+    Args:
+      batch: The list of _PlannedSpec to run.
+      instances: A dict of the suite instances of this run by suite.
+    """
+    files = set()
+    self._traced(files, self._run_batch, batch, instances)
+    for planned in batch:
+      self.impact[_spec_key(planned)] = files
+
+  def _enter_suites_traced(self, path, started, instances, suite_files):
+    """Leaves and enters suites like _enter_suites, recording their files.
+
+    Args:
+      path: A tuple of the suites of the next spec, as for _enter_suites.
+      started: The list of the suites started, as for _enter_suites.
+      instances: A dict of the suite instances of this run by suite.
+      suite_files: A dict of the source files that the before_all and
+        after_all functions of each suite run, by suite. The files run on the
+        way are added to the suites left and entered.
+    Returns:
+      What _enter_suites returns.
+    """
+    before = [entry[0] for entry in started]
+    files = set()
+    cause = self._traced(files, self._enter_suites, path, started, instances)
+    after = [entry[0] for entry in started]
+    common = 0
+    while (common < min(len(before), len(after)) and
+           before[common] is after[common]):
+      common += 1
+    for suite in before[common:] + after[common:]:
+      suite_files.setdefault(suite, set()).update(files)
+    return cause
+
+  def _traced(self, files, function, *args):
+    """Calls a function, recording the source files it runs.
+
+    A tracer already set, like that of a coverage tool, keeps tracing.
+
+    Args:
+      files: The set to add the paths of the source files to.
+      function: The function to call.
+      *args: The arguments of the call.
+    Returns:
+      The return value of the function.
+    """
+    previous = sys.gettrace()
+
+    def trace(frame, event, arg):
+      files.add(frame.f_code.co_filename)
+      if previous is not None:
+        return previous(frame, event, arg)
+
+    sys.settrace(trace)
+    try:
+      return function(*args)
+    finally:
+      sys.settrace(previous)
+
+  def _add_suite_files(self, plan, suite_files):
+    """Adds the files of the suites of the specs that ran to their impact.
+
+    Args:
+      plan: The list of _PlannedSpec of a top level suite.
+      suite_files: A dict of the source files that the before_all and
+        after_all functions of each suite ran, by suite.
+    """
+    for planned in plan:
+      key = _spec_key(planned)
+      if key in self.impact:
+        self.impact[key] = self.impact[key].union(*(
+            suite_files.get(suite, ())
+            for suite in planned.parents + (planned.suite,)))
+
+  def _run_one(self, plan):
+    """Runs the planned specs of a single top level suite.
+
+    With MEMORY, the objects retained by the suite and its specs are measured.
+
+    Args:
+      plan: The list of _PlannedSpec of the suite.
+    """
+    if not MEMORY:
+      self._run_suite(plan)
+      return
+    self.measured = ([], [], [])
+    objects = _count_objects()
+    self._run_suite(plan)
+    suite_growth = _count_growth(objects, _count_objects())
+    self._record_memory(_top_suite_name(plan[0]), suite_growth)
+
+  def _run_suite(self, plan):
+    """Runs the planned specs of a single top level suite, in batches.
+
+    Args:
+      plan: The list of _PlannedSpec of the suite.
+    """
+    instances = {}
+    started = []
+    suite_files = {}
+    self.event_loop = None
+    for batch in _batches(plan):
+      if self.stopped:
+        break
+      self.console.tick()
+      planned = batch[0]
+      path = planned.parents + (planned.suite,)
+      if RECORD_IMPACT:
+        cause = self._enter_suites_traced(
+            path, started, instances, suite_files)
+      else:
+        cause = self._enter_suites(path, started, instances)
+      if cause is not None:
+        self._fail_unrun(batch, cause)
+      elif RECORD_IMPACT:
+        self._run_traced(batch, instances)
+      else:
+        self._run_batch(batch, instances)
+    if RECORD_IMPACT:
+      self._enter_suites_traced((), started, instances, suite_files)
+      self._add_suite_files(plan, suite_files)
+    else:
+      self._enter_suites((), started, instances)
+    if self.event_loop is not None:
+      _asyncio().set_event_loop(None)
+      self.event_loop.close()
+    self.console.flush()
+
+  def _run_parallel(self):
+    """Runs the top level suites across a pool of JOBS worker processes.
+
+    The suites are dispatched in _dispatch_order, but their results are
+    collected in suite order, so the counts and the printed output are the
+    same as for a serial run. Once the runner is stopped, the suites still
+    running are abandoned.
+    """
+    import multiprocessing  # Only needed to run in parallel.
+    global _WORKER_RUNNER
+    _WORKER_RUNNER = self
+    pool = multiprocessing.Pool(min(JOBS, len(self.plan)))
+    try:
+      results = pool.imap_unordered(
+          _run_in_worker, self._dispatch_order(), chunksize=1)
+      pending = {}
+      collected = 0
+      for result in results:
+        pending[result['index']] = result
+        while collected in pending and not self.stopped:
+          self._collect(pending.pop(collected))
+          collected += 1
+        if self.stopped:
+          pool.terminate()
+          break
+    finally:
+      pool.close()
+      pool.join()
+      _WORKER_RUNNER = None
+
+  def _dispatch_order(self):
+    """Orders the top level suites for the workers, the longest first.
+
+    The suites that took the longest in the last runs start first, so that
+    the workers finish about the same time.
+
+    Returns:
+      A list of the indices of the suites in the plan.
+    """
+    order = range(len(self.plan))
+    if not CACHE_FILE:
+      return order
+    outcomes = _load_cache(CACHE_FILE)
+    return sorted(order, reverse=True, key=lambda index: sum(
+        outcomes.get(_spec_key(planned), {}).get('duration', 0)
+        for planned in self.plan[index]))
+
+  def _collect(self, result):
+    """Adds the results of a top level suite run by a worker to this run.
+
+    Args:
+      result: The dict returned by _run_in_worker.
+    """
+    self.failures += result['failures']
+    self.spec_count += result['spec_count']
+    self.console.write(result['output'])
+    for name, event in result['events']:
+      self._emit(name, event)
+    self.slowest = heapq.nlargest(SLOWEST, self.slowest + result['slowest'])
+    self.allocations = heapq.nlargest(
+        MEMORY, self.allocations + result['allocations'])
+    self.retained.update(result['retained'])
+    for suite_name, objects in result['suite_objects'].iteritems():
+      self.suite_objects.setdefault(suite_name, []).extend(objects)
+    self.over_budget.extend(result['over_budget'])
+    self.impact.update(result['impact'])
+    self.outcomes.update(result['outcomes'])
+    self.benchmarks.update(result['benchmarks'])
+
+  def run(self, max_failures=0):
+    """Runs and times the suites, printing the results.
+
+    Args:
+      max_failures: Stop running specs once this many failed. 0 runs them all.
+    """
+    self.max_failures = max_failures
     self.failures = 0
     self.spec_count = 0
-    self.results = []
+    self.slowest = []
+    self.allocations = []
+    self.retained = {}
+    self.over_budget = []
+    self.impact = {}
+    self.outcomes = {}
+    self.benchmarks = {}
     start = time.time()
     sys.exc_clear()
-    map(self._run_one, itertools.ifilter(lambda x: x.top, self.suites))
+    self._emit('jazz_started', {'suite_count': len(self.plan)})
+    if JOBS > 1 and len(self.plan) > 1:
+      self._run_parallel()
+    else:
+      map(self._run_one, self.plan)
+    self.console.flush()
     elapsed = time.time() - start
+    self._emit('jazz_done', {
+        'failures': self.failures,
+        'spec_count': self.spec_count,
+        'elapsed': elapsed,
+    })
+    if self.stopped and self.spec_count < self.spec_total:
+      print '==== STOPPED ==== %d/%d tests not run after %d failures.' % (
+          self.spec_total - self.spec_count, self.spec_total, self.failures)
     if self.failures:
       print '==== FAILED ==== %d/%d tests failed.' % (
           self.failures, self.spec_count)
     elif VERBOSITY > 0:
       print '==== PASSED ==== %s tests passed in %.3fs' % (
           self.spec_count, elapsed)
+    if VERBOSITY > 0:
+      self._print_timings()
+      if MEMORY:
+        self._print_memory()
+    if RECORD_IMPACT:
+      _save_impact_index(IMPACT_INDEX, self.impact)
+    if CACHE_FILE:
+      _save_cache(CACHE_FILE, self.outcomes)
+    if SAVE_BASELINE:
+      _save_cache(BASELINE, self.benchmarks)
     return self.failures, self.spec_count, elapsed
@@ -0,0 +1,95 @@
+"""Micro benchmarks for pyJazz.
+
+Run directly to print the per-call cost of the hot paths:
+
+  python jazz_bench.py
+"""
+
+import subprocess
+import sys
+import timeit
+
+
+def _bench(label, stmt, setup='import jazz', number=100000, repeat=3):
+  """Times a statement and prints its best per-call cost.
+
+  Args:
+    label: A name for the benchmark.
+    stmt: The statement to time.
+    setup: The statement run once before timing.
+    number: How many times to run stmt per repetition.
+    repeat: How many repetitions to take the best of.
+  """
+  best = min(timeit.Timer(stmt, setup).repeat(repeat, number))
+  print '%-40s %8.2f usec' % (label, best / number * 1e6)
+
+
+def bench_expect():
+  """The cost of creating and asserting an expectation."""
+  _bench('expect()',
+         'jazz.expect(1)',
+         'import jazz; jazz._unasserted_expectations.clear()')
+  _bench('expect().toEqual()', 'jazz.expect(1).toEqual(1)')
+  _bench('expect().toEqual() 30 frames deep', 'nest(30)',
+         'import jazz\n'
+         'def nest(n):\n'
+         '  return nest(n - 1) if n else jazz.expect(1).toEqual(1)',
+         number=10000)
+
+
+_MOCK_SPIES = """
+import collections
+import jazz
+import mock
+
+class JazzMock(mock.Mock):
+
+  def _get_child_mock(self, name=None, **kwargs):
+    if name and name != '__name__':
+      return JazzMock()
+    return None
+
+def callable_(*args, **kwargs): pass
+
+def create_spy(name):
+  return JazzMock(spec=callable_, name=name)
+
+def create_spy_obj(name, methods):
+  t = collections.namedtuple(name, methods)
+  s = t(*(callable_,) * len(methods))
+  return JazzMock(spec=s, name=name)
+"""
+
+
+def bench_spies():
+  """The cost of spies, against spies backed by mock.Mock."""
+  jazz_spies = 'import jazz\nfrom jazz import create_spy, create_spy_obj'
+  for label, setup in (('mock', _MOCK_SPIES), ('jazz', jazz_spies)):
+    _bench('%s create_spy()' % label, 'create_spy("foo")', setup,
+           number=10000)
+    _bench('%s create_spy_obj()' % label,
+           'create_spy_obj("foo", ["bar", "baz"])', setup, number=1000)
+    _bench('%s spy call' % label, 'spy(1, a=2)',
+           setup + '\nspy = create_spy("foo")', number=10000)
+    _bench('%s toHaveBeenCalledWith()' % label,
+           'jazz.expect(spy).toHaveBeenCalledWith(1, a=2)',
+           setup + '\nspy = create_spy("foo")\nspy(1, a=2)', number=10000)
+  _bench('jazz toHaveBeenCalledWith() 10000 calls',
+         'jazz.expect(spy).toHaveBeenCalledWith(9999, a=2)',
+         jazz_spies + '\nspy = create_spy("foo")\n'
+         'for i in xrange(10000): spy(i, a=2)', number=1000)
+
+
+def bench_import(repeat=10):
+  """The cost of importing jazz in a fresh interpreter."""
+  stmt = ('import time; start = time.time(); import jazz; '
+          'print time.time() - start')
+  best = min(float(subprocess.check_output([sys.executable, '-c', stmt]))
+             for _ in xrange(repeat))
+  print '%-40s %8.2f msec' % ('import jazz', best * 1e3)
+
+
+if __name__ == '__main__':
+  bench_expect()
+  bench_spies()
+  bench_import()
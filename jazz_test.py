@@ -1,10 +1,30 @@
 """Tests for pyJazz."""
 
 import cStringIO
+import imp
+import itertools
 import jazz
+import json
 import mock
+import os
+import signal
+import subprocess
 import sys
+import tempfile
+import time
 import unittest
+import warnings
+from xml.etree import ElementTree
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+try:
+  import trollius
+except ImportError:
+  trollius = None
 
 def the_spanish_inquisition():
   """Because one should always expect it."""
@@ -18,6 +38,7 @@ class SuiteRunnerTest(unittest.TestCase):
     self.stdout_bak = sys.stdout
     sys.stdout = cStringIO.StringIO()
     jazz.VERBOSITY = 9
+    jazz.CACHE_FILE = None
 
   def tearDown(self):
     sys.stdout = self.stdout_bak
@@ -26,6 +47,14 @@ class SuiteRunnerTest(unittest.TestCase):
   def output(self):
     return sys.stdout.getvalue()
 
+  def fake_clock(self):
+    """Replaces the timer of specs with a clock that only specs advance."""
+    clock = [0.0]
+    patcher = mock.patch('timeit.default_timer', lambda: clock[0])
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    return clock
+
   def test_unasserted_expectations_are_bad(self):
 
     class TheTestClass(jazz.Describe):
@@ -33,11 +62,60 @@ class SuiteRunnerTest(unittest.TestCase):
       def it_should_hate_this(self):
         jazz.expect(the_spanish_inquisition())
 
-    self.assertRaisesRegexp(SystemExit, '1', jazz.run)
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
     out = self.output
     self.assertIn('The Test Class should hate this.', out)
     self.assertIn('UnassertedExpectation(', out)
 
+  def test_unasserted_expectations_do_not_leak_into_other_specs(self):
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_hate_this(self):
+        jazz.expect(the_spanish_inquisition())
+
+      def it_should_not_mind_this(self):
+        jazz.expect(the_spanish_inquisition()).toEqual(42)
+
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
+    self.assertIn('[OK] The Test Class should not mind this.', self.output)
+    self.assertFalse(jazz._unasserted_expectations)
+
+  def test_unasserted_expectations_of_setup_and_tear_down_are_bad(self):
+
+    class TheTestClass(jazz.Describe):
+
+      def before_all(self):
+        jazz.expect(1)
+
+      def it_should_come_after_before_all(self): pass
+
+    class AnotherTestClass(jazz.Describe):
+
+      def after_each(self):
+        jazz.expect(2)
+
+      def it_should_come_before_after_each(self): pass
+
+    self.assertRaisesRegexp(SystemExit, '2', jazz.run, [])
+    out = self.output
+    self.assertIn('[!!] The Test Class should come after before all.\n'
+                  '     UnassertedExpectation(', out)
+    self.assertIn('[!!] Another Test Class should come before after each.\n'
+                  '     UnassertedExpectation(', out)
+
+  def test_spec_names_lose_only_their_prefix(self):
+
+    class TheTestClass(jazz.Describe):
+
+      def it_takes_time(self): pass
+
+      def itTriesIt(self): pass
+
+    jazz.run([])
+    out = self.output
+    self.assertIn('The Test Class takes time.', out)
+    self.assertIn('The Test Class tries it.', out)
 
   def test_xcluded_tests_do_not_run(self):
     it_ran = []
@@ -50,7 +128,7 @@ class SuiteRunnerTest(unittest.TestCase):
       def xit_should_not_run_this(self):
         it_ran.append(2)
 
-    jazz.run()
+    jazz.run([])
     self.assertEqual([1], it_ran)
 
   def test_solo_tests_only_run(self):
@@ -64,7 +142,7 @@ class SuiteRunnerTest(unittest.TestCase):
       def it_should_not_run_this(self):
         it_ran.append(2)
 
-    jazz.run()
+    jazz.run([])
     self.assertEqual([1], it_ran)
 
   def test_nested_suites_run(self):
@@ -80,7 +158,7 @@ class SuiteRunnerTest(unittest.TestCase):
       def it_should_run_this(self):
         it_ran.append(1)
 
-    jazz.run()
+    jazz.run([])
     self.assertEqual([1, 2], it_ran)
 
   def test_nested_suites_with_same_name(self):
@@ -97,7 +175,7 @@ class SuiteRunnerTest(unittest.TestCase):
         it_ran.append(1)
 
     
-    jazz.run()
+    jazz.run([])
     out = self.output
     self.assertIn('The Test Class should run this.', out)
     self.assertIn('The Test Class > The Test Class should run this too.', out)
@@ -121,7 +199,7 @@ class SuiteRunnerTest(unittest.TestCase):
       def it_should_not_run_this(self):
         it_ran.append(1)
 
-    jazz.run()
+    jazz.run([])
     self.assertEqual([3], it_ran)
 
   def test_before_eaches_run(self):
@@ -145,7 +223,7 @@ class SuiteRunnerTest(unittest.TestCase):
 
       def it_two(self): pass
 
-    jazz.run()
+    jazz.run([])
     expected = [1, 1, 1, 2, 1, 2]
     self.assertEqual(expected, it_ran)
 
@@ -170,10 +248,760 @@ class SuiteRunnerTest(unittest.TestCase):
 
       def it_two(self): pass
 
-    jazz.run()
+    jazz.run([])
     expected = [1, 1, 1, 2, 1, 2]
     self.assertEqual(expected, it_ran)
 
+  def test_runs_reuse_the_plan_with_fresh_suites(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_count(self):
+        self.count = getattr(self, 'count', 0) + 1
+        it_ran.append(self.count)
+
+    jazz.RUNS = 3
+    with mock.patch.object(
+        jazz, '_spec_name', wraps=jazz._spec_name) as spec_name:
+      jazz.run([])
+    self.assertEqual(1, spec_name.call_count)
+    self.assertEqual([1, 1, 1], it_ran)
+
+  def test_max_failures_stops_the_run(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def after_each(self):
+        it_ran.append('after')
+
+      @jazz.it
+      def ShouldFail(self):
+        it_ran.append('fail')
+        jazz.expect(1).toBe(2)
+
+      class SubTestClass(jazz.Describe):
+
+        @jazz.it
+        def ShouldNotRun(self):
+          it_ran.append('run')
+
+    jazz.MAX_FAILURES = 1
+    jazz.RUNS = 2
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
+    self.assertEqual(['fail', 'after'], it_ran)
+    out = self.output
+    self.assertIn('==== STOPPED ==== 1/2 tests not run after 1 failures.', out)
+    self.assertIn('==== STOPPED ==== after 1/2 runs.', out)
+
+  def test_command_line_options_override_settings(self):
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_run_this(self): pass
+
+    jazz.run([])
+    self.assertIn('The Test Class should run this.', self.output)
+    sys.stdout = cStringIO.StringIO()
+    jazz.run(['--quiet'])
+    self.assertEqual('', self.output)
+    self.assertEqual(0, jazz.VERBOSITY)
+
+  def test_specs_are_filtered_by_name(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def before_each(self):
+        it_ran.append('before')
+
+      def it_should_not_run_this(self):
+        it_ran.append(1)
+
+      class SubTestClass(jazz.Describe):
+
+        def __init__(self):
+          it_ran.append('sub')
+
+        def it_should_run_this(self):
+          it_ran.append(2)
+
+    class AnotherTestClass(jazz.Describe):
+
+      def __init__(self):
+        it_ran.append('another')
+
+      def it_should_run_this(self):
+        it_ran.append(3)
+
+    jazz.run(['--filter', 'Sub Test Class should run'])
+    self.assertEqual(['before', 'sub', 2], it_ran)
+
+  def test_specs_are_selected_by_tags(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      @jazz.it(tags=['slow'])
+      def ShouldBeSlow(self):
+        it_ran.append(1)
+
+      @jazz.it
+      def ShouldBeQuick(self):
+        it_ran.append(2)
+
+      @jazz.xit(tags=['slow'], timeout=1)
+      def ShouldBeExcluded(self):
+        it_ran.append(4)
+
+      class SubTestClass(jazz.Describe):
+        tags = ['slow', 'db']
+
+        @jazz.it
+        def ShouldBeSlowToo(self):
+          it_ran.append(3)
+
+    jazz.run(['--tag', 'slow', '--exclude-tag', 'db'])
+    self.assertEqual([1], it_ran)
+    del it_ran[:]
+    jazz.run(['--tag', 'db', '--exclude-tag', 'none'])
+    self.assertEqual([3], it_ran)
+
+  def test_specs_are_selected_by_impact(self):
+    it_ran = []
+    directory = tempfile.mkdtemp()
+    helper_file = os.path.join(directory, 'impact_helper.py')
+    index_file = os.path.join(directory, 'impact.json')
+    with open(helper_file, 'w') as f:
+      f.write('def helper():\n  return 1\n')
+    helper = imp.load_source('impact_helper', helper_file)
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_use_the_helper(self):
+        it_ran.append(helper.helper())
+
+      def it_should_not_use_the_helper(self):
+        it_ran.append(2)
+
+    jazz.run(['--impacted', '--impact-index', index_file])
+    self.assertIn('running all specs', self.output)
+    self.assertEqual([2, 1], it_ran)
+    jazz.run(['--record-impact', '--impact-index', index_file])
+    del it_ran[:]
+    jazz.run(['--impacted', '--impact-index', index_file])
+    self.assertEqual([], it_ran)
+    with open(helper_file, 'w') as f:
+      f.write('def helper():\n  return 1  # Changed.\n')
+    jazz.run(['--impacted', '--impact-index', index_file])
+    self.assertEqual([1], it_ran)
+
+  def test_impact_includes_before_all_and_after_all(self):
+    it_ran = []
+    directory = tempfile.mkdtemp()
+    helper_file = os.path.join(directory, 'impact_suite_helper.py')
+    index_file = os.path.join(directory, 'impact.json')
+    with open(helper_file, 'w') as f:
+      f.write('def build():\n  return 1\n')
+    helper = imp.load_source('impact_suite_helper', helper_file)
+
+    class TheTestClass(jazz.Describe):
+
+      def before_all(self):
+        self.built = helper.build()
+
+      def it_should_use_what_was_built(self):
+        it_ran.append(self.built)
+
+    class AnotherTestClass(jazz.Describe):
+
+      def it_should_not_use_it(self):
+        it_ran.append(2)
+
+    jazz.run(['--record-impact', '--impact-index', index_file])
+    with open(helper_file, 'w') as f:
+      f.write('def build():\n  return 1  # Changed.\n')
+    del it_ran[:]
+    jazz.run(['--impacted', '--impact-index', index_file])
+    self.assertEqual([1], it_ran)
+
+  def test_recording_impact_keeps_the_current_tracer(self):
+    traced = []
+
+    def tracer(frame, event, arg):
+      traced.append(frame.f_code.co_name)
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_be_traced(self):
+        pass
+
+    index_file = os.path.join(tempfile.mkdtemp(), 'impact.json')
+    original = sys.gettrace()
+    sys.settrace(tracer)
+    try:
+      jazz.run(['--record-impact', '--impact-index', index_file])
+      current = sys.gettrace()
+    finally:
+      sys.settrace(original)
+    self.assertIs(tracer, current)
+    self.assertIn('it_should_be_traced', traced)
+
+  def test_failed_specs_are_run_first(self):
+    it_ran = []
+    fail = set(['d'])
+    fd, cache_file = tempfile.mkstemp()
+    os.close(fd)
+    self.addCleanup(os.remove, cache_file)
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_a(self):
+        it_ran.append('a')
+
+      def it_should_b(self):
+        it_ran.append('b')
+
+    class AnotherTestClass(jazz.Describe):
+
+      def it_should_c(self):
+        it_ran.append('c')
+
+      def it_should_d(self):
+        it_ran.append('d')
+        jazz.expect('d' in fail).toBe(False)
+
+    self.assertRaises(SystemExit, jazz.run, ['--cache-file', cache_file])
+    self.assertEqual(['a', 'b', 'c', 'd'], it_ran)
+    del it_ran[:]
+    self.assertRaises(SystemExit, jazz.run, ['--failed-first'])
+    self.assertEqual(['d', 'c', 'a', 'b'], it_ran)
+    del it_ran[:]
+    fail.clear()
+    jazz.FAILED_FIRST = False
+    jazz.run(['--last-failed'])
+    self.assertEqual(['d'], it_ran)
+    del it_ran[:]
+    jazz.run([])
+    self.assertIn('No failures recorded, running all specs.', self.output)
+    self.assertEqual(['a', 'b', 'c', 'd'], it_ran)
+
+  def test_failed_nested_suites_are_run_first_as_a_whole(self):
+    it_ran = []
+    fd, cache_file = tempfile.mkstemp()
+    os.close(fd)
+    self.addCleanup(os.remove, cache_file)
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_a(self):
+        it_ran.append('a')
+
+      class TheNestedClass(jazz.Describe):
+
+        def before_all(self):
+          it_ran.append('before all')
+
+        def after_all(self):
+          it_ran.append('after all')
+
+        def it_should_b(self):
+          it_ran.append('b')
+
+        def it_should_c(self):
+          it_ran.append('c')
+          jazz.expect(True).toBe(False)
+
+    self.assertRaises(SystemExit, jazz.run, ['--cache-file', cache_file])
+    del it_ran[:]
+    self.assertRaises(SystemExit, jazz.run, ['--failed-first'])
+    self.assertEqual(['before all', 'c', 'b', 'after all', 'a'], it_ran)
+
+  def test_before_all_and_after_all_run_once_per_suite(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def before_all(self):
+        it_ran.append('before all')
+        self.value = 42
+
+      def after_all(self):
+        it_ran.append('after all')
+
+      def before_each(self):
+        it_ran.append('before each')
+
+      def it_should_run_first(self):
+        jazz.expect(self.value).toBe(42)
+        it_ran.append('spec')
+
+      def it_should_run_second(self):
+        it_ran.append('spec')
+
+      class SubTestClass(jazz.Describe):
+
+        def before_all(self):
+          it_ran.append('sub before all')
+
+        def after_all(self):
+          it_ran.append('sub after all')
+
+        def it_should_run_third(self):
+          it_ran.append(3)
+
+    class AnotherTestClass(jazz.Describe):
+
+      def after_all(self):
+        it_ran.append('another after all')
+
+      def it_should_run_last(self):
+        it_ran.append(4)
+
+    jazz.run([])
+    self.assertEqual(['before all', 'before each', 'spec', 'before each',
+                      'spec', 'sub before all', 'before each', 3,
+                      'sub after all', 'after all', 4, 'another after all'],
+                     it_ran)
+
+  def test_failing_before_all_fails_the_specs_of_its_suite(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def before_all(self):
+        raise ValueError('no database')
+
+      def after_all(self):
+        it_ran.append('after all')
+
+      def it_should_not_run(self):
+        it_ran.append('spec')
+
+      class SubTestClass(jazz.Describe):
+
+        def before_all(self):
+          it_ran.append('sub before all')
+
+        def it_should_not_run_either(self):
+          it_ran.append('sub spec')
+
+    class AnotherTestClass(jazz.Describe):
+
+      def it_should_still_run(self):
+        it_ran.append('another spec')
+
+    self.assertRaisesRegexp(SystemExit, '2', jazz.run, [])
+    self.assertEqual(['after all', 'another spec'], it_ran)
+    out = self.output
+    self.assertIn('[!!] The Test Class should not run.\n'
+                  '     ValueError(no database)', out)
+    self.assertIn('[!!] The Test Class > Sub Test Class should not run either.'
+                  '\n     ValueError(no database)', out)
+    self.assertIn('==== FAILED ==== 2/3 tests failed.', out)
+
+  def test_failing_after_all_is_reported(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def after_all(self):
+        raise ValueError('cannot clean up')
+
+      def it_should_run(self):
+        it_ran.append('spec')
+
+    class AnotherTestClass(jazz.Describe):
+
+      def it_should_still_run(self):
+        it_ran.append('another spec')
+
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
+    self.assertEqual(['spec', 'another spec'], it_ran)
+    self.assertIn('[!!] The Test Class after all.\n'
+                  '     ValueError(cannot clean up)', self.output)
+
+  def test_fixtures_are_lazy_and_kept_for_the_suite(self):
+    built = []
+
+    class TheTestClass(jazz.Describe):
+
+      @jazz.let
+      def index(self):
+        built.append('index')
+        return {'key': 'value'}
+
+      @jazz.let
+      def unused(self):
+        built.append('unused')
+
+      def it_should_build_the_index(self):
+        jazz.expect(self.index['key']).toBe('value')
+
+      def it_should_keep_the_index(self):
+        jazz.expect(self.index).toEqual({'key': 'value'})
+
+    jazz.run([])
+    self.assertEqual(['index'], built)
+    jazz.run([])
+    self.assertEqual(['index', 'index'], built)
+
+  def test_benchmark_specs_are_compared_to_the_baseline(self):
+    clock = self.fake_clock()
+    delay = [0.001]
+    fd, baseline_file = tempfile.mkstemp()
+    os.close(fd)
+    self.addCleanup(os.remove, baseline_file)
+
+    class TheTestClass(jazz.Describe):
+
+      @jazz.benchmark(warmup=0, repeat=3, number=1)
+      def ShouldBeFast(self):
+        clock[0] += delay[0]
+
+    jazz.run(['--baseline', baseline_file, '--save-baseline'])
+    self.assertIn('[OK] The Test Class should be fast. [min 1.000ms, '
+                  'median 1.000ms, stddev 0.000us of 3 x 1 runs]', self.output)
+    with open(baseline_file) as f:
+      baseline = json.load(f)['jazz_test: The Test Class should be fast']
+    self.assertEqual(3, baseline['repeat'])
+    self.assertAlmostEqual(0.001, baseline['min'])
+    delay[0] = 0.002
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, ['--regression', '50'])
+    self.assertIn('BenchmarkRegression(Min 2.000ms is 100% slower than the '
+                  'baseline min 1.000ms.)', self.output)
+
+  def test_memory_leaks_are_found_across_runs(self):
+    leaked = []
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_leak(self):
+        leaked.extend([] for _ in xrange(50))
+
+      def it_should_not_leak(self):
+        jazz.expect([[] for _ in xrange(20)]).toHaveLength(20)
+
+    class AnotherTestClass(jazz.Describe):
+
+      @jazz.let
+      def fixture(self):
+        return [[] for _ in xrange(10)]
+
+      def it_should_not_leak_its_fixture(self):
+        jazz.expect(self.fixture).toHaveLength(10)
+
+    jazz.run(['--memory', '2', '--runs', '3'])
+    out = self.output
+    self.assertIn('==== TOP 2 SPECS BY RETAINED OBJECTS ====', out)
+    self.assertRegexpMatches(
+        out, r'  \+5\d objects The Test Class should leak \(list \+5\d')
+    self.assertRegexpMatches(
+        out, r'  \+1\d objects Another Test Class should not leak its '
+        r'fixture \(list \+1\d')
+    self.assertIn('==== 1 SUITES LEAKING ACROSS 3 RUNS ====\n'
+                  '  +50 objects per run in The Test Class (list +50)\n'
+                  '    +50 of those objects retained by The Test Class should '
+                  'leak\n', out)
+
+  def test_specs_time_out(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+      timeout = 0.05
+
+      def after_each(self):
+        it_ran.append('after')
+
+      def it_should_be_stuck(self):
+        time.sleep(10)
+
+      @jazz.it(timeout=0)
+      def ShouldHaveNoTimeout(self):
+        time.sleep(0.1)
+        jazz.expect(1).toBe(1)
+
+      class SubTestClass(jazz.Describe):
+
+        def it_should_be_stuck_too(self):
+          while True: pass
+
+    class AnotherTestClass(jazz.Describe):
+
+      def it_should_be_stuck_for_a_while(self):
+        time.sleep(0.5)
+
+    start = time.time()
+    self.assertRaisesRegexp(SystemExit, '3', jazz.run, ['--timeout', '0.1'])
+    self.assertLess(time.time() - start, 1)
+    out = self.output
+    self.assertIn('SpecTimeout(Timed out after 0.05s.)', out)
+    self.assertIn('in it_should_be_stuck\n    time.sleep(10)', out)
+    self.assertIn('in it_should_be_stuck_too\n    while True: pass', out)
+    self.assertIn('SpecTimeout(Timed out after 0.1s.)', out)
+    self.assertIn('[OK] The Test Class should have no timeout.', out)
+    self.assertEqual(['after'] * 3, it_ran)
+
+  def test_failures_are_printed_before_the_next_spec(self):
+    printed = []
+    output = lambda: self.output
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_a(self):
+        jazz.expect(1).toBe(2)
+
+      def it_should_b(self):
+        printed.append(output())
+
+    self.assertRaises(SystemExit, jazz.run, [])
+    self.assertIn('[!!] The Test Class should a.', printed[0])
+
+  def test_specs_catching_every_exception_time_out(self):
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_retry_forever(self):
+        while True:
+          try:
+            time.sleep(0.01)
+            raise IOError('connection refused')
+          except Exception:
+            pass
+
+    start = time.time()
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, ['--timeout', '0.1'])
+    self.assertLess(time.time() - start, 1)
+    self.assertIn('SpecTimeout(Timed out after 0.1s.)', self.output)
+
+  def test_setup_and_tear_down_time_out(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+      timeout = 0.05
+
+      def before_each(self):
+        if not it_ran:
+          time.sleep(10)
+
+      def after_each(self):
+        it_ran.append('after')
+        if len(it_ran) > 1:
+          time.sleep(10)
+
+      def it_should_a(self):
+        it_ran.append('a')
+
+      def it_should_b(self):
+        it_ran.append('b')
+
+    start = time.time()
+    self.assertRaisesRegexp(SystemExit, '2', jazz.run, [])
+    self.assertLess(time.time() - start, 1)
+    self.assertEqual(['after', 'b', 'after'], it_ran)
+    out = self.output
+    self.assertIn('in before_each\n    time.sleep(10)', out)
+    self.assertIn('in after_each\n    time.sleep(10)', out)
+
+  def test_timeouts_restore_the_alarm_handler(self):
+    handler = lambda signum, frame: None
+    previous = signal.signal(signal.SIGALRM, handler)
+    self.addCleanup(signal.signal, signal.SIGALRM, previous)
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_finish(self):
+        pass
+
+    jazz.run(['--timeout', '1'])
+    self.assertIs(handler, signal.getsignal(signal.SIGALRM))
+
+  def test_slowest_specs_are_listed(self):
+    clock = self.fake_clock()
+
+    class TheTestClass(jazz.Describe):
+
+      def before_each(self):
+        clock[0] += 0.001
+
+      def it_should_be_quick(self): pass
+
+      def it_should_be_slow(self):
+        clock[0] += 0.01
+
+    jazz.SLOWEST = 1
+    jazz.run([])
+    out = self.output
+    self.assertIn('==== SLOWEST 1 SPECS ====\n'
+                  '  0.011s The Test Class should be slow (before each 0.001s, '
+                  'spec 0.010s, after each 0.000s)', out)
+    self.assertNotIn('should be quick (', out)
+
+  def test_specs_over_budget_are_flagged(self):
+    clock = self.fake_clock()
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_be_quick(self): pass
+
+      def it_should_be_slow(self):
+        clock[0] += 0.01
+
+    jazz.BUDGET = 0.005
+    jazz.run([])
+    out = self.output
+    self.assertIn('should be slow. [SLOW 0.010s]', out)
+    self.assertIn('should be quick.\n', out)
+    self.assertIn('==== 1 SPECS OVER THE 0.005s BUDGET ====', out)
+
+  def test_output_is_buffered_until_the_suite_is_done(self):
+    seen = []
+
+    class TheTestClass(jazz.Describe):
+
+      def it_one(self): pass
+
+      def it_two(self):
+        seen.append(sys.stdout.getvalue())
+
+    class AnotherTestClass(jazz.Describe):
+
+      def it_three(self):
+        seen.append(sys.stdout.getvalue())
+
+    jazz.VERBOSITY = 2
+    jazz.run([])
+    self.assertEqual(['', '. . '], seen)
+    self.assertEqual('. . . ==== PASSED', self.output[:17])
+
+  def test_parallel_run_matches_serial_run(self):
+
+    class FirstTestClass(jazz.Describe):
+
+      def it_one(self): pass
+
+      class SubTestClass(jazz.Describe):
+
+        def it_two(self):
+          jazz.expect(1).toEqual(2)
+
+    class SecondTestClass(jazz.Describe):
+
+      def it_three(self): pass
+
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
+    serial = self.output.splitlines()
+    sys.stdout = cStringIO.StringIO()
+    jazz.JOBS = 2
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
+    self.assertEqual(serial, self.output.splitlines())
+    self.assertIn('1/3 tests failed.', self.output)
+
+  def test_parallel_run_prints_suites_in_order(self):
+    fd, cache_file = tempfile.mkstemp()
+    os.close(fd)
+    self.addCleanup(os.remove, cache_file)
+
+    class AlphaTestClass(jazz.Describe):
+
+      def it_one(self): pass
+
+    class BetaTestClass(jazz.Describe):
+
+      def it_two(self): pass
+
+    class GammaTestClass(jazz.Describe):
+
+      def it_three(self): pass
+
+    jazz.run(['--no-cache'])
+    serial = self.output.splitlines()[:-1]
+    with open(cache_file, 'w') as f:
+      json.dump({
+          'jazz_test: Beta Test Class two': {'duration': 5},
+          'jazz_test: Gamma Test Class three': {'duration': 9},
+      }, f)
+    sys.stdout = cStringIO.StringIO()
+    jazz.run(['--cache-file', cache_file, '--jobs', '3'])
+    self.assertEqual(serial, self.output.splitlines()[:-1])
+
+
+class ReporterTest(unittest.TestCase):
+
+  def setUp(self):
+    reload(jazz)
+    jazz.CACHE_FILE = None
+    self.stdout_bak = sys.stdout
+    sys.stdout = cStringIO.StringIO()
+    fd, self.filename = tempfile.mkstemp()
+    os.close(fd)
+
+    class TheTestClass(jazz.Describe):
+
+      def it_should_pass(self): pass
+
+      class SubTestClass(jazz.Describe):
+
+        def it_should_fail(self):
+          jazz.expect(1).toEqual(2)
+
+  def tearDown(self):
+    sys.stdout = self.stdout_bak
+    os.remove(self.filename)
+
+  def test_reporter_is_notified(self):
+    reporter = mock.Mock(spec=jazz.Reporter)
+    jazz.add_reporter(reporter)
+    self.assertRaises(SystemExit, jazz.run, [])
+
+    reporter.jazz_started.assert_called_once_with({'suite_count': 1})
+    self.assertEqual(2, reporter.suite_started.call_count)
+    self.assertEqual(2, reporter.spec_done.call_count)
+    failed = reporter.spec_done.call_args[0][0]
+    self.assertEqual('failed', failed['status'])
+    self.assertEqual(['The Test Class'], failed['parents'])
+    self.assertEqual('The Test Class > Sub Test Class should fail',
+                     failed['full_name'])
+    self.assertEqual('AssertionError', failed['error'])
+    self.assertEqual('Expected 1 to equal 2.', failed['message'])
+    done = reporter.jazz_done.call_args[0][0]
+    self.assertEqual((1, 2), (done['failures'], done['spec_count']))
+
+  def test_json_lines_report(self):
+    jazz.JSON_REPORT = self.filename
+    self.assertRaises(SystemExit, jazz.run, [])
+
+    with open(self.filename) as report:
+      events = [json.loads(line) for line in report]
+    self.assertEqual(
+        ['jazz_started', 'suite_started', 'spec_done', 'suite_started',
+         'spec_done', 'suite_done', 'suite_done', 'jazz_done'],
+        [event['event'] for event in events])
+    self.assertEqual('passed', events[2]['status'])
+
+  def test_junit_xml_report(self):
+    jazz.JUNIT_REPORT = self.filename
+    self.assertRaises(SystemExit, jazz.run, [])
+
+    suite = ElementTree.parse(self.filename).getroot().find('testsuite')
+    self.assertEqual('The Test Class', suite.get('name'))
+    cases = suite.findall('testcase')
+    self.assertEqual(['should pass', 'should fail'],
+                     [case.get('name') for case in cases])
+    self.assertIsNone(cases[0].find('failure'))
+    self.assertEqual('Expected 1 to equal 2.',
+                     cases[1].find('failure').get('message'))
+
+
+class ImportTest(unittest.TestCase):
+
+  def test_import_is_lightweight(self):
+    modules = subprocess.check_output([
+        sys.executable, '-c', 'import jazz, sys; print sorted(set(sys.modules) '
+        '& set(["mock", "multiprocessing", "optparse", "json", "numpy"]))'])
+    self.assertEqual('[]', modules.strip())
+
 
 class CustomMatchersTest(unittest.TestCase):
 
@@ -219,6 +1047,16 @@ class CustomMatchersTest(unittest.TestCase):
     with self.assertRaises(AssertionError):
       jazz.expect(a).notToBeOneMoreThan(e)
 
+  def test_replaced_matcher_is_resolved_again(self):
+    jazz.add_matcher({'be foo': lambda a: True})
+    jazz.expect(jazz).toBeFoo()
+    self.assertIn('toBeFoo', vars(jazz._Expectation))
+
+    jazz.add_matcher({'be foo': lambda a: False})
+    self.assertNotIn('toBeFoo', vars(jazz._Expectation))
+    with self.assertRaises(AssertionError):
+      jazz.expect(jazz).toBeFoo()
+
 
 class SpyTest(unittest.TestCase):
 
@@ -237,11 +1075,110 @@ class SpyTest(unittest.TestCase):
     with self.assertRaises(AttributeError):
       spy().foo()
 
+  def test_spy_counts_calls(self):
+    spy = jazz.create_spy('foo')
+    jazz.expect(spy).notToHaveBeenCalled()
+    spy(1)
+    spy(2, bar=3)
+    self.assertEqual(2, spy.call_count)
+    jazz.expect(spy).toHaveBeenCalled()
+    jazz.expect(spy).toHaveBeenCalledWith(2, bar=3)
+    with self.assertRaisesRegexp(AssertionError, 'Expected foo to have been '
+                                 'called with 2.'):
+      jazz.expect(spy).toHaveBeenCalledWith(2)
+
+  def test_spy_finds_calls_with_unhashable_arguments(self):
+    spy = jazz.create_spy('foo')
+    spy([1], bar={2})
+    spy(3)
+    jazz.expect(spy).toHaveBeenCalledWith(3)
+    jazz.expect(spy).toHaveBeenCalledWith([1], bar={2})
+    jazz.expect(spy).toHaveBeenCalledWith([1], bar=frozenset([2]))
+    jazz.expect(spy).notToHaveBeenCalledWith([1])
+    spy(4)
+    jazz.expect(spy).toHaveBeenCalledWith(4)
+
+  def test_spy_finds_calls_with_arguments_hashed_by_identity(self):
+
+    class Point(object):
+
+      def __init__(self, x):
+        self.x = x
+
+      def __eq__(self, other):
+        return isinstance(other, Point) and self.x == other.x
+
+    spy = jazz.create_spy('foo')
+    spy(Point(1), bar=(Point(2),))
+    jazz.expect(spy).toHaveBeenCalledWith(Point(1), bar=(Point(2),))
+    spy(3)
+    jazz.expect(spy).toHaveBeenCalledWith(3)
+    jazz.expect(spy).notToHaveBeenCalledWith(Point(2))
+
+  def test_spy_looks_calls_up_in_its_index(self):
+    spy = jazz.create_spy('foo')
+    for number in xrange(1000):
+      spy(number, bar='baz')
+    jazz.expect(spy).toHaveBeenCalledWith(999, bar='baz')
+    spy.calls = None
+    jazz.expect(spy).toHaveBeenCalledWith(0, bar='baz')
+    jazz.expect(spy).notToHaveBeenCalledWith(1000, bar='baz')
+
+  def test_spy_returns_its_return_value(self):
+    spy = jazz.create_spy('foo')
+    spy.return_value = 42
+    self.assertEqual(42, spy(1))
+    spy.assert_called_with(1)
+    spy.assert_called_once_with(1)
+    self.assertEqual([((1,), {})], spy.call_args_list)
+
+  def test_spy_has_side_effects(self):
+    spy = jazz.create_spy('foo')
+    spy.side_effect = ValueError('bar')
+    with self.assertRaisesRegexp(ValueError, 'bar'):
+      spy()
+    spy.side_effect = lambda number: number * 2
+    self.assertEqual(6, spy(3))
+    spy.side_effect = [1, KeyError]
+    self.assertEqual(1, spy())
+    with self.assertRaises(KeyError):
+      spy()
+    self.assertEqual(4, spy.call_count)
+
+  def test_spy_asserts_calls_like_a_mock(self):
+    spy = jazz.create_spy('foo')
+    with self.assertRaisesRegexp(AssertionError, 'Not called'):
+      spy.assert_called_with(1)
+    spy(1, bar=2)
+    spy(3)
+    spy.assert_any_call(1, bar=2)
+    with self.assertRaisesRegexp(AssertionError,
+                                 r'Expected call: foo\(1, bar=2\)\n'
+                                 r'Actual call: foo\(3\)'):
+      spy.assert_called_with(1, bar=2)
+    with self.assertRaisesRegexp(AssertionError, 'Called 2 times'):
+      spy.assert_called_once_with(3)
+    spy.reset_mock()
+    self.assertIsNone(spy.call_args)
+    jazz.expect(spy).notToHaveBeenCalledWith(3)
+
+  def test_spy_obj_types_are_reused(self):
+    spy = jazz.create_spy_obj('foo', ['baz'])
+    other = jazz.create_spy_obj('foo', ['baz'])
+    self.assertIs(type(spy), type(other))
+    self.assertIsNot(spy.baz, other.baz)
+
   def test_spy_obj_records(self):
     spy = jazz.create_spy_obj('foo', ['baz', 'cat'])
     spy.baz(456)
     jazz.expect(spy.baz).to_have_been_called_with(456)
 
+  def test_spy_obj_methods_can_be_stubbed(self):
+    spy = jazz.create_spy_obj('foo', ['baz'])
+    spy.baz.return_value = 'cat'
+    self.assertEqual('cat', spy.baz(1))
+    spy.baz.assert_called_with(1)
+
   def test_spy_obj_methods_are_restricted(self):
     spy = jazz.create_spy_obj('foo', ['baz'])
     with self.assertRaises(AttributeError):
@@ -264,6 +1201,36 @@ class ExpectationTest(unittest.TestCase):
         'test_stringification:string = ' +
         'str(jazz.expect(the_spanish_inquisition()))', string)
 
+  def test_passing_matchers_do_not_describe_values(self):
+    value = mock.NonCallableMagicMock()
+    value.__str__.side_effect = AssertionError('Described!')
+    jazz.expect(value).toBe(value)
+    jazz.expect(value).notToBeNone()
+
+  def test_failure_messages_are_truncated(self):
+    jazz.MAX_REPR_SIZE = 10
+    with self.assertRaisesRegexp(
+        AssertionError, r'^Expected xxxxxxxxxx\.\.\.<90 more> to be none '
+        r'None\.$'):
+      jazz.expect('x' * 100).toBeNone()
+    self.assertIn('expect(xxxxxxxxxx...<90 more>)', str(jazz.expect('x' * 100)))
+
+  def test_failure_messages_render_only_the_start_of_containers(self):
+
+    class Unshown(object):
+
+      def __repr__(self):
+        raise AssertionError('Described!')
+
+    jazz.MAX_REPR_SIZE = 20
+    unshown = Unshown()
+    with self.assertRaisesRegexp(
+        AssertionError,
+        r'^Expected \[0, 1, 2, 3, 4, \.\.\.\] to be none None\.$'):
+      jazz.expect(range(10) + [unshown] * 10000).toBeNone()
+    self.assertIn("expect({0: 'xxxxxxx...xxxxx...)",
+                  str(jazz.expect({0: 'x' * 100, 1: 'y'})))
+
   def test_matchers_can_be_chained(self):
     (jazz.expect(3)
       .toBe(3)
@@ -375,6 +1342,52 @@ class ExpectationTest(unittest.TestCase):
     with self.assertRaises(AssertionError):
       jazz.expect(a).notToEqual(e)
 
+  def test_expectation_equal_explains_differences(self):
+    with self.assertRaises(AssertionError) as raised:
+      jazz.expect({'a': [1, 2], 'b': 3}).toEqual({'a': [1, 5, 6], 'c': 4})
+    self.assertEqual([
+        'Differences (-expected +actual):',
+        "['a'][1]", '  -5', '  +2',
+        "['a'][2]", '  -6',
+        "['c']", '  -4',
+        "['b']", '  +3',
+    ], str(raised.exception).splitlines()[1:])
+
+  def test_expectation_equal_compares_items_with_eq(self):
+
+    class Point(object):
+
+      def __init__(self, x):
+        self.x = x
+
+      def __eq__(self, other):
+        return isinstance(other, Point) and self.x == other.x
+
+      def __repr__(self):
+        return 'Point(%d)' % self.x
+
+    with self.assertRaises(AssertionError) as raised:
+      jazz.expect([Point(1), {'a': Point(2)}, 3]).toEqual(
+          [Point(1), {'a': Point(2)}, 4])
+    self.assertEqual([
+        'Differences (-expected +actual):', '[2]', '  -4', '  +3',
+    ], str(raised.exception).splitlines()[1:])
+
+  def test_expectation_equal_diffs_lines(self):
+    with self.assertRaises(AssertionError) as raised:
+      jazz.expect('one\ntwo\nthree').toEqual('one\n2\nthree')
+    self.assertEqual([
+        'Differences (-expected +actual):',
+        '  @@ -1,3 +1,3 @@', '   one', '  -2', '  +two', '   three',
+    ], str(raised.exception).splitlines()[5:])
+
+  def test_expectation_equal_limits_differences(self):
+    with self.assertRaises(AssertionError) as raised:
+      jazz.expect(range(100)).toEqual(range(1, 101))
+    lines = str(raised.exception).splitlines()
+    self.assertEqual(3 + jazz._MAX_DIFFS * 3, len(lines))
+    self.assertEqual('...', lines[-1])
+
   def test_expectation_match(self):
     a = 'some string here matches'
     e = r'.*matches'
@@ -397,6 +1410,14 @@ class ExpectationTest(unittest.TestCase):
     with self.assertRaises(AssertionError):
       jazz.expect(a).notToRaise()
 
+  def test_expectation_run_faster_than(self):
+    jazz.expect(lambda: None).toRunFasterThan(0.01)
+    jazz.expect(lambda: time.sleep(0.01)).notToRunFasterThan(0.01)
+    with self.assertRaisesRegexp(
+        AssertionError, r'to run faster than 0.001\. '
+        r'The best of 3 calls took \d+\.\d{3}ms\.$'):
+      jazz.expect(lambda: time.sleep(0.002)).toRunFasterThan(0.001)
+
   def test_expectation_been_called(self):
     m = mock.Mock()
     jazz.expect(m).notToHaveBeenCalled()
@@ -413,6 +1434,255 @@ class ExpectationTest(unittest.TestCase):
     with self.assertRaises(AssertionError):
       jazz.expect([1, 2]).toHaveLength(3)
 
+  def test_expectation_have_length_counts_lazily(self):
+    numbers = itertools.count()
+    jazz.expect(itertools.islice(numbers, 3)).toHaveLength(3)
+    jazz.expect(numbers).notToHaveLength(3)
+    self.assertEqual(7, next(numbers))
+
+  def test_expectation_contain_all(self):
+    jazz.expect(iter([1, 2, 3, 2])).toContainAll([2, 2, 1])
+    jazz.expect(iter([[1], [2]])).toContainAll([[2]])
+    jazz.expect(iter([[1], 2])).toContainAll([2])
+    with self.assertRaises(AssertionError):
+      jazz.expect(iter([1, 2, 3])).toContainAll([2, 2])
+
+    numbers = itertools.count()
+    jazz.expect(numbers).toContainAll([2, 1])
+    self.assertEqual(3, next(numbers))
+    jazz.expect(numbers).toContainAll([])
+    self.assertEqual(4, next(numbers))
+
+  def test_expectation_contain_all_of_an_iterator(self):
+    jazz.expect(iter([[1], [2]])).toContainAll(iter([[2]]))
+    with self.assertRaises(AssertionError):
+      jazz.expect(iter([[1]])).toContainAll(iter([[2]]))
+
+  def test_expectation_contain_in_order(self):
+    jazz.expect(iter([1, 2, 3, 4])).toContainInOrder([1, 3, 4])
+    with self.assertRaises(AssertionError):
+      jazz.expect(iter([1, 2, 3, 4])).toContainInOrder([3, 1])
+
+    numbers = itertools.count()
+    jazz.expect(numbers).toContainInOrder([1, 3])
+    self.assertEqual(4, next(numbers))
+
+
+
+@unittest.skipUnless(numpy, 'NumPy is not installed.')
+class ArrayMatchersTest(unittest.TestCase):
+
+  def setUp(self):
+    reload(jazz)
+    self.array = numpy.arange(12.).reshape(3, 4)
+
+  def test_expectation_be_all_close_to(self):
+    jazz.expect(self.array).toBeAllCloseTo(self.array + 1e-9)
+    jazz.expect(self.array).toBeAllCloseTo(self.array + 0.1, atol=0.2)
+    with self.assertRaises(AssertionError):
+      jazz.expect(self.array).notToBeAllCloseTo(self.array)
+    with self.assertRaisesRegexp(AssertionError, r'Shape \(3, 4\) != \(4, 3\)'):
+      jazz.expect(self.array).toBeAllCloseTo(self.array.T)
+
+  def test_expectation_equal_array(self):
+    jazz.expect(self.array).toEqualArray(self.array.copy())
+    different = self.array.copy()
+    different[1:] = -1
+    with self.assertRaisesRegexp(
+        AssertionError, r'8/12 elements differ: \(1, 0\): 4.0 != -1.0, '
+        r'(.*, ){4}\.\.\.$'):
+      jazz.expect(self.array).toEqualArray(different)
+
+  def test_expectation_equal_array_finds_mismatches_in_chunks(self):
+    jazz._ARRAY_CHUNK_SIZE = 4
+    different = self.array.copy()
+    different[2, 1:] = -1
+    with self.assertRaisesRegexp(
+        AssertionError, r'3/12 elements differ: \(2, 1\): 9.0 != -1.0, '
+        r'\(2, 2\): 10.0 != -1.0, \(2, 3\): 11.0 != -1.0$'):
+      jazz.expect(self.array).toEqualArray(different)
+    with self.assertRaisesRegexp(AssertionError, r'\(\): 1 != 2$'):
+      jazz.expect(numpy.array(1)).toEqualArray(numpy.array(2))
+
+  def test_expectation_equal_array_of_other_dtype(self):
+    strings = numpy.array([['a'] * 4] * 3)
+    with warnings.catch_warnings():
+      warnings.simplefilter('ignore')
+      with self.assertRaisesRegexp(
+          AssertionError, 'Dtypes float64 and \|S1 are not comparable.'):
+        jazz.expect(self.array).toEqualArray(strings)
+
+  def test_expectation_have_shape(self):
+    jazz.expect(self.array).toHaveShape((3, 4))
+    with self.assertRaises(AssertionError):
+      jazz.expect(self.array).toHaveShape([4, 3])
+
+  def test_expectation_have_dtype(self):
+    jazz.expect(self.array).toHaveDtype(float)
+    with self.assertRaises(AssertionError):
+      jazz.expect(self.array).toHaveDtype('int32')
+
+
+@unittest.skipUnless(trollius, 'Trollius is not installed.')
+class CoroutineSpecTest(unittest.TestCase):
+
+  def setUp(self):
+    reload(jazz)
+    jazz.CACHE_FILE = None
+    self.stdout_bak = sys.stdout
+    sys.stdout = cStringIO.StringIO()
+    jazz.VERBOSITY = 9
+
+  def tearDown(self):
+    sys.stdout = self.stdout_bak
+
+  @property
+  def output(self):
+    return sys.stdout.getvalue()
+
+  def test_coroutine_specs_run_on_the_event_loop(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def before_each(self):
+        yield trollius.From(trollius.sleep(0))
+        self.value = 42
+
+      def after_each(self):
+        yield trollius.From(trollius.sleep(0))
+        it_ran.append('after')
+
+      def it_should_wait(self):
+        value = yield trollius.From(trollius.sleep(0, result=self.value))
+        jazz.expect(value).toBe(42)
+        it_ran.append('spec')
+
+      def it_should_fail(self):
+        yield trollius.From(trollius.sleep(0))
+        jazz.expect(self.value).toBe(0)
+
+      def it_should_not_forget_expectations(self):
+        yield trollius.From(trollius.sleep(0))
+        jazz.expect(self.value)
+
+    self.assertRaisesRegexp(SystemExit, '2', jazz.run, [])
+    out = self.output
+    self.assertIn('Expected 42 to be 0.', out)
+    self.assertIn('UnassertedExpectation(', out)
+    self.assertIn('[OK] The Test Class should wait.', out)
+    self.assertNotIn('trollius', out)
+    self.assertEqual(['after', 'after', 'after', 'spec'], sorted(it_ran))
+
+  def test_independent_specs_run_concurrently(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def before_each(self):
+        self.delay = 0.1
+
+      @jazz.it(independent=True)
+      def ShouldWaitFirst(self):
+        it_ran.append('first')
+        yield trollius.From(trollius.sleep(self.delay))
+        jazz.expect(1).toBe(1)
+
+      @jazz.it(independent=True)
+      def ShouldWaitSecond(self):
+        it_ran.append('second')
+        yield trollius.From(trollius.sleep(self.delay))
+        jazz.expect(2)
+
+      @jazz.it(independent=True)
+      def ShouldWaitThird(self):
+        it_ran.append('third')
+        yield trollius.From(trollius.sleep(self.delay))
+        jazz.expect(3).toBe(3)
+
+    start = time.time()
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
+    self.assertLess(time.time() - start, 0.25)
+    self.assertEqual(['first', 'second', 'third'], sorted(it_ran))
+    out = self.output
+    self.assertIn('[OK] The Test Class should wait first.', out)
+    self.assertIn('[!!] The Test Class should wait second.', out)
+    self.assertIn('[OK] The Test Class should wait third.', out)
+
+  def test_independent_specs_get_returned_values(self):
+
+    @trollius.coroutine
+    def fetch(value):
+      yield trollius.From(trollius.sleep(0))
+      raise trollius.Return(value)
+
+    class TheTestClass(jazz.Describe):
+
+      @jazz.it(independent=True)
+      def ShouldGetFirst(self):
+        value = yield trollius.From(fetch(1))
+        jazz.expect(value).toBe(1)
+
+      @jazz.it(independent=True)
+      def ShouldGetSecond(self):
+        value = yield trollius.From(fetch(2))
+        jazz.expect(value).toBe(2)
+
+    jazz.run([])
+    out = self.output
+    self.assertIn('[OK] The Test Class should get first.', out)
+    self.assertIn('[OK] The Test Class should get second.', out)
+
+  def test_independent_specs_record_their_impact(self):
+    directory = tempfile.mkdtemp()
+    helper_file = os.path.join(directory, 'impact_helper.py')
+    index_file = os.path.join(directory, 'impact.json')
+    with open(helper_file, 'w') as f:
+      f.write('def helper():\n  return 1\n')
+    helper = imp.load_source('impact_helper', helper_file)
+
+    class TheTestClass(jazz.Describe):
+
+      @jazz.it(independent=True)
+      def ShouldUseTheHelper(self):
+        yield trollius.From(trollius.sleep(0))
+        jazz.expect(helper.helper()).toBe(1)
+
+      @jazz.it(independent=True)
+      def ShouldNotUseTheHelper(self):
+        yield trollius.From(trollius.sleep(0))
+
+    jazz.run(['--record-impact', '--impact-index', index_file])
+    with open(index_file) as f:
+      specs = json.load(f)['specs']
+    self.assertEqual(2, len(specs))
+    for files in specs.itervalues():
+      self.assertIn(os.path.abspath(helper_file), files)
+
+  def test_coroutine_specs_time_out(self):
+    it_ran = []
+
+    class TheTestClass(jazz.Describe):
+
+      def after_each(self):
+        it_ran.append('after')
+
+      @jazz.it(independent=True, timeout=0.05)
+      def ShouldBeStuck(self):
+        yield trollius.From(trollius.sleep(10))
+
+      @jazz.it(independent=True, timeout=0.5)
+      def ShouldFinish(self):
+        yield trollius.From(trollius.sleep(0.1))
+        jazz.expect(1).toBe(1)
+
+    self.assertRaisesRegexp(SystemExit, '1', jazz.run, [])
+    out = self.output
+    self.assertIn('[!!] The Test Class should be stuck.\n'
+                  '     SpecTimeout(Timed out after 0.05s.)', out)
+    self.assertIn('[OK] The Test Class should finish.', out)
+    self.assertEqual(['after'] * 2, it_ran)
+
 
 if __name__ == '__main__':
   unittest.main()